@@ -704,17 +704,19 @@ in {
           fi
         fi
 
-        offline_thread_nodes=0
+        offline_thread_nodes=unknown
         if command -v matter-health >/dev/null 2>&1; then
-          offline_thread_nodes="$(
-            matter-health 2>/dev/null \
-              | awk -F '\t' '
-                  NR==1 { next }
-                  $2=="False" && $5 ~ /(Inovelli|Meross|IKEA of Sweden|SmartWings|Aqara|Nanoleaf)/ { c++ }
-                  END { print c+0 }
-                '
-          )"
-          if [ "$offline_thread_nodes" -ge "$offline_threshold" ]; then
+          # Always-on Thread nodes (no sleepy remotes) from the vendors this
+          # watchdog has always counted. A failed query leaves the count
+          # unknown rather than reading as a healthy 0.
+          if ! offline_thread_nodes="$(
+            matter-health --available false --thread-only --count \
+              --vendor Inovelli --vendor Meross --vendor 'IKEA of Sweden' \
+              --vendor SmartWings --vendor Aqara --vendor Nanoleaf
+          )" || ! [[ "$offline_thread_nodes" =~ ^[0-9]+$ ]]; then
+            echo "matter-thread-watchdog: matter-health query failed; offline_thread_nodes unknown"
+            offline_thread_nodes=unknown
+          elif [ "$offline_thread_nodes" -ge "$offline_threshold" ]; then
             if [ -n "$bad_reason" ]; then
               bad_reason="$bad_reason; offline_thread_nodes=$offline_thread_nodes"
             else
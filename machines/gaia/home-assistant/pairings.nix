@@ -569,13 +569,15 @@
     ps.websockets
   ]);
 
-  matterPairInteractiveScript = ./scripts/matter-pair-interactive.py;
+  matterScriptsDir = ./scripts;
+  matterPairInteractiveScript = "${matterScriptsDir}/matter-pair-interactive.py";
   matterPairRetryScript = ./scripts/matter-pair-retry.sh;
 
   matterPairInteractiveTool = pkgs.writeShellApplication {
     name = "matter-pair-interactive";
     runtimeInputs = [pythonEnv];
     text = ''
+      export PYTHONPATH='${matterScriptsDir}':''${PYTHONPATH:-}
       export MATTER_DESIRED_PAIRINGS_JSON='${matterDesiredPairingsJson}'
       export MATTER_ENV_FILE='${config.sops.secrets."matter-env".path}'
       exec ${pythonEnv}/bin/python3 ${matterPairInteractiveScript} "$@"
@@ -1,19 +1,27 @@
 {
+  config,
   pkgs,
   matterNodeRooms ? {},
   matterNodeRoomsByLabel ? {},
   ...
 }: let
   keepaliveIntervalSec = 30;
+  # Forced keepalive products; matter-health shares the policy so the Thread
+  # watchdog counts the same always-on nodes.
+  keepaliveForceProductKeywords = "fp300,presence,bilresa,myggbett";
 
   pythonEnv = pkgs.python3.withPackages (ps: [
     ps.websockets
   ]);
 
-  matterKeepaliveScript = ./scripts/matter-keepalive.py;
-  matterEventsScript = ./scripts/matter-events.py;
-  matterHealthScript = ./scripts/matter-health.py;
-  matterWatchScript = ./scripts/matter-watch.py;
+  # Ship the whole directory so the scripts can import the shared
+  # matter_client module via PYTHONPATH.
+  matterScriptsDir = ./scripts;
+  matterKeepaliveScript = "${matterScriptsDir}/matter-keepalive.py";
+  matterEventsScript = "${matterScriptsDir}/matter-events.py";
+  matterEventsQueryScript = "${matterScriptsDir}/matter-events-query.py";
+  matterHealthScript = "${matterScriptsDir}/matter-health.py";
+  matterWatchScript = "${matterScriptsDir}/matter-watch.py";
   matterNodeRoomsJson = builtins.toJSON matterNodeRooms;
   matterNodeRoomsByLabelJson = builtins.toJSON matterNodeRoomsByLabel;
   matterWsPort = "5580";
@@ -23,13 +31,22 @@
     name = "matter-keepalive";
     runtimeInputs = [pythonEnv];
     text = ''
+      export PYTHONPATH='${matterScriptsDir}':''${PYTHONPATH:-}
       export MATTER_KEEPALIVE_INTERVAL_SEC=''${MATTER_KEEPALIVE_INTERVAL_SEC:-${toString keepaliveIntervalSec}}
       export MATTER_KEEPALIVE_READ_TIMEOUT_SEC=''${MATTER_KEEPALIVE_READ_TIMEOUT_SEC:-4}
       export MATTER_KEEPALIVE_SKIP_SLEEPY=''${MATTER_KEEPALIVE_SKIP_SLEEPY:-1}
       export MATTER_KEEPALIVE_NODE_BACKOFF_BASE_SEC=''${MATTER_KEEPALIVE_NODE_BACKOFF_BASE_SEC:-60}
       export MATTER_KEEPALIVE_NODE_BACKOFF_MAX_SEC=''${MATTER_KEEPALIVE_NODE_BACKOFF_MAX_SEC:-900}
       export MATTER_KEEPALIVE_MAX_ATTRIBUTES_PER_PASS=''${MATTER_KEEPALIVE_MAX_ATTRIBUTES_PER_PASS:-1}
-      export MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS="''${MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS:-fp300,presence,bilresa,myggbett}"
+      export MATTER_KEEPALIVE_MAX_INFLIGHT=''${MATTER_KEEPALIVE_MAX_INFLIGHT:-4}
+      export MATTER_KEEPALIVE_MAX_INFLIGHT_PER_ROUTER=''${MATTER_KEEPALIVE_MAX_INFLIGHT_PER_ROUTER:-2}
+      export MATTER_KEEPALIVE_READS_PER_SEC=''${MATTER_KEEPALIVE_READS_PER_SEC:-2}
+      export MATTER_KEEPALIVE_READ_BURST=''${MATTER_KEEPALIVE_READ_BURST:-4}
+      export MATTER_KEEPALIVE_HEDGE_FORCED=''${MATTER_KEEPALIVE_HEDGE_FORCED:-1}
+      export MATTER_KEEPALIVE_METRICS_PORT=''${MATTER_KEEPALIVE_METRICS_PORT:-9586}
+      export MATTER_NODE_ROOMS_JSON='${matterNodeRoomsJson}'
+      export MATTER_NODE_ROOMS_BY_LABEL_JSON='${matterNodeRoomsByLabelJson}'
+      export MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS="''${MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS:-${keepaliveForceProductKeywords}}"
       export MATTER_KEEPALIVE_FORCE_ATTRIBUTE_PATHS="''${MATTER_KEEPALIVE_FORCE_ATTRIBUTE_PATHS:-1/69/0,2/1030/0,1/1030/0,0/47/12,0/40/5}"
       exec ${pythonEnv}/bin/python3 ${matterKeepaliveScript} "$@"
     '';
@@ -39,14 +56,28 @@
     name = "matter-events";
     runtimeInputs = [pythonEnv];
     text = ''
+      export PYTHONPATH='${matterScriptsDir}':''${PYTHONPATH:-}
       exec ${pythonEnv}/bin/python3 ${matterEventsScript} "$@"
     '';
   };
 
+  matterEventsQueryTool = pkgs.writeShellApplication {
+    name = "matter-events-query";
+    runtimeInputs = [pythonEnv];
+    text = ''
+      export PYTHONPATH='${matterScriptsDir}':''${PYTHONPATH:-}
+      export MATTER_EVENTS_DIR=''${MATTER_EVENTS_DIR:-/var/lib/matter-events}
+      exec ${pythonEnv}/bin/python3 ${matterEventsQueryScript} "$@"
+    '';
+  };
+
   matterHealthTool = pkgs.writeShellApplication {
     name = "matter-health";
     runtimeInputs = [pythonEnv];
     text = ''
+      export PYTHONPATH='${matterScriptsDir}':''${PYTHONPATH:-}
+      export MATTER_KEEPALIVE_SKIP_SLEEPY=''${MATTER_KEEPALIVE_SKIP_SLEEPY:-1}
+      export MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS="''${MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS:-${keepaliveForceProductKeywords}}"
       exec ${pythonEnv}/bin/python3 ${matterHealthScript} "$@"
     '';
   };
@@ -55,10 +86,15 @@
     name = "matter-watch";
     runtimeInputs = [pythonEnv];
     text = ''
+      export PYTHONPATH='${matterScriptsDir}':''${PYTHONPATH:-}
       export MATTER_NODE_ROOMS_JSON='${matterNodeRoomsJson}'
       export MATTER_NODE_ROOMS_BY_LABEL_JSON='${matterNodeRoomsByLabelJson}'
       export MATTER_WS_URL='${matterWsUrl}'
       export MATTER_WATCH_ZBT2_ENABLE='1'
+      # MATTER_SITE_* live in the matter-env secret; matter-watch reads them
+      # from there when it can (root, or the service's EnvironmentFile) and
+      # otherwise asks matter-solar-api.
+      export MATTER_ENV_FILE=''${MATTER_ENV_FILE:-'${config.sops.secrets."matter-env".path}'}
       exec ${pythonEnv}/bin/python3 ${matterWatchScript} "$@"
     '';
   };
@@ -66,10 +102,63 @@ in {
   environment.systemPackages = [
     matterKeepaliveTool
     matterEventsTool
+    matterEventsQueryTool
     matterHealthTool
     matterWatchTool
   ];
 
-  # Keep the manual `matter-keepalive` tool available, but do not run the
-  # background service while matter-layer performs targeted stale probes.
+  # `matter-keepalive` stays a manual tool while matter-layer performs
+  # targeted stale probes. The services below only subscribe to
+  # matter-server and never probe nodes; all but matter-watch (which reads
+  # the matter-env secret and hands its socket to wheel) run unprivileged.
+
+  # One shared matter-server subscription for every `matter-watch` viewer;
+  # the tool attaches to this socket when it exists. The socket is 0660
+  # root:wheel, so admins attach and anyone else watches directly.
+  systemd.services.matter-watch = {
+    description = "Shared matter-watch snapshot server";
+    wantedBy = ["multi-user.target"];
+    after = ["podman-matter-server.service"];
+    serviceConfig = {
+      Type = "simple";
+      Restart = "always";
+      RestartSec = "5s";
+      RuntimeDirectory = "matter-watch";
+      EnvironmentFile = config.sops.secrets."matter-env".path;
+      ExecStart = "${matterWatchTool}/bin/matter-watch --serve --socket /run/matter-watch/watch.sock --socket-group wheel";
+    };
+  };
+
+  # Durable event history for debugging remote actions after the fact.
+  systemd.services.matter-events-recorder = {
+    description = "Matter event recorder";
+    wantedBy = ["multi-user.target"];
+    after = ["podman-matter-server.service"];
+    serviceConfig = {
+      Type = "simple";
+      Restart = "always";
+      RestartSec = "5s";
+      DynamicUser = true;
+      StateDirectory = "matter-events";
+      ExecStart = "${matterEventsTool}/bin/matter-events --record /var/lib/matter-events";
+    };
+  };
+
+  # Resident node availability for `matter-health` (and the Thread
+  # watchdog that calls it every tick); the tool falls back to a direct
+  # matter-server query when this socket is missing or, for non-root
+  # callers, not accessible.
+  systemd.services.matter-health = {
+    description = "Matter node health query daemon";
+    wantedBy = ["multi-user.target"];
+    after = ["podman-matter-server.service"];
+    serviceConfig = {
+      Type = "simple";
+      Restart = "always";
+      RestartSec = "5s";
+      DynamicUser = true;
+      RuntimeDirectory = "matter-health";
+      ExecStart = "${matterHealthTool}/bin/matter-health --serve --socket /run/matter-health/health.sock";
+    };
+  };
 }
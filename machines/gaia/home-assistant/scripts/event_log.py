@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+
+from matter_node_store import parse_attr_path
+
+# Recorded matter-server events, as segmented gzip NDJSON:
+#   events-<start_ms>.ndjson.gz   one gzip member per written batch
+#   events-<start_ms>.idx.ndjson  one line per member:
+#       {"t0": first_t, "t1": last_t, "off": offset, "len": bytes, "n": records, "nodes": bitmap}
+# A reader can skip members by time or node and decompress only the ones it
+# needs by seeking to "off". "nodes" is a NODE_BITS-wide bitmap of the node
+# ids present (bit n % NODE_BITS for node n) as a hex string; a set bit can
+# be a false positive, never a false negative. Index lines are appended
+# after each batch, so the active segment is queryable too.
+SEGMENT_BYTES_DEFAULT = 8 * 1024 * 1024
+SEGMENT_SEC_DEFAULT = 3600
+RETENTION_BYTES_DEFAULT = 512 * 1024 * 1024
+RETENTION_SEC_DEFAULT = 30 * 86400
+FLUSH_SEC_DEFAULT = 1.0
+BATCH_MAX = 2000
+# Records held while the disk is failing; past this new events are dropped
+# (and counted) rather than growing memory without bound.
+QUEUE_MAX_DEFAULT = 200_000
+WRITE_RETRY_SEC = 1.0
+WRITE_RETRY_MAX_SEC = 60.0
+NODE_BITS = 256
+RECORDED_EVENTS = {"node_event", "attribute_updated", "node_added", "node_updated", "node_removed"}
+
+
+def event_record(message: dict, now_epoch: float | None = None) -> dict | None:
+    """Compact record for a matter-server event, or None when it is not recorded.
+
+    Node added/updated events carry the whole node; only its availability
+    is kept.
+    """
+    event = message.get("event")
+    if event not in RECORDED_EVENTS:
+        return None
+    data = message.get("data")
+    record: dict = {"t": round(time.time() if now_epoch is None else now_epoch, 3), "event": event}
+    if event == "attribute_updated" and isinstance(data, (list, tuple)) and len(data) >= 3:
+        record["node"] = data[0]
+        record["path"] = data[1]
+        parsed = parse_attr_path(data[1]) if isinstance(data[1], str) else None
+        if parsed:
+            record["endpoint"], record["cluster"], record["attr"] = parsed
+        record["value"] = data[2]
+    elif event == "node_event" and isinstance(data, dict):
+        record["node"] = data.get("node_id")
+        record["endpoint"] = data.get("endpoint_id")
+        record["cluster"] = data.get("cluster_id")
+        record["event_id"] = data.get("event_id")
+        record["data"] = data
+    elif event in {"node_added", "node_updated"} and isinstance(data, dict):
+        record["node"] = data.get("node_id")
+        record["available"] = bool(data.get("available"))
+    elif event == "node_removed":
+        record["node"] = data.get("node_id") if isinstance(data, dict) else data
+    else:
+        return None
+    return record
+
+
+def snapshot_records(nodes: list[dict], now_epoch: float | None = None) -> list[dict]:
+    """Availability of every node at (re)connect, so a window of records has a baseline."""
+    now_epoch = round(time.time() if now_epoch is None else now_epoch, 3)
+    return [
+        {"t": now_epoch, "event": "snapshot", "node": node.get("node_id"), "available": bool(node.get("available"))}
+        for node in nodes
+        if isinstance(node, dict) and isinstance(node.get("node_id"), int)
+    ]
+
+
+def node_bitmap(node_ids) -> int:
+    bitmap = 0
+    for node_id in node_ids:
+        if isinstance(node_id, int) and node_id >= 0:
+            bitmap |= 1 << (node_id % NODE_BITS)
+    return bitmap
+
+
+def segment_files(directory: str) -> list[tuple[int, str]]:
+    """(start_ms, path without extension) for every segment, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    out = []
+    for name in names:
+        if name.startswith("events-") and name.endswith(".ndjson.gz"):
+            stamp = name[len("events-"):-len(".ndjson.gz")]
+            if stamp.isdigit():
+                out.append((int(stamp), os.path.join(directory, f"events-{stamp}")))
+    return sorted(out)
+
+
+def read_index(base: str) -> list[dict]:
+    """Index entries of a segment, oldest first; a torn last line is skipped."""
+    blocks = []
+    try:
+        with open(f"{base}.idx.ndjson", "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    block = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(block, dict):
+                    blocks.append(block)
+    except FileNotFoundError:
+        pass
+    return blocks
+
+
+def _decode_block(raw: bytes):
+    try:
+        payload = gzip.decompress(raw)
+    except (OSError, EOFError):
+        # A block cut short by a crash mid-write.
+        return
+    for line in payload.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def read_records(
+    directory: str,
+    *,
+    since: float | None = None,
+    until: float | None = None,
+    nodes: set[int] | None = None,
+    counters: dict | None = None,
+):
+    """Yield records with since <= t < until for nodes, oldest first.
+
+    counters, when given, gets "blocks" and "blocks_read" totals.
+    """
+    wanted = node_bitmap(nodes) if nodes else 0
+    counters = counters if counters is not None else {}
+    counters.setdefault("blocks", 0)
+    counters.setdefault("blocks_read", 0)
+    for start_ms, base in segment_files(directory):
+        if until is not None and start_ms / 1000.0 >= until:
+            break
+        blocks = read_index(base)
+        counters["blocks"] += len(blocks)
+        selected = [
+            block
+            for block in blocks
+            if (since is None or float(block["t1"]) >= since)
+            and (until is None or float(block["t0"]) < until)
+            and (not wanted or int(block["nodes"], 16) & wanted)
+        ]
+        if not selected:
+            continue
+        try:
+            handle = open(f"{base}.ndjson.gz", "rb")
+        except FileNotFoundError:
+            continue
+        with handle:
+            for block in selected:
+                counters["blocks_read"] += 1
+                handle.seek(int(block["off"]))
+                for record in _decode_block(handle.read(int(block["len"]))):
+                    t = float(record.get("t") or 0)
+                    if since is not None and t < since:
+                        continue
+                    if until is not None and t >= until:
+                        continue
+                    if nodes and record.get("node") not in nodes:
+                        continue
+                    yield record
+
+
+class EventRecorder:
+    """Writes queued event records in batches, off the receive loop."""
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_bytes: int = SEGMENT_BYTES_DEFAULT,
+        segment_sec: float = SEGMENT_SEC_DEFAULT,
+        retention_bytes: int = RETENTION_BYTES_DEFAULT,
+        retention_sec: float = RETENTION_SEC_DEFAULT,
+        flush_sec: float = FLUSH_SEC_DEFAULT,
+        queue_max: int = QUEUE_MAX_DEFAULT,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_sec = segment_sec
+        self.retention_bytes = retention_bytes
+        self.retention_sec = retention_sec
+        self.flush_sec = flush_sec
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_max)
+        self.written = 0
+        self.dropped = 0
+        self._dropping = False
+        self._closing = False
+        self._base: str | None = None
+        self._segment_start = 0.0
+        self._segment_bytes = 0
+
+    def record(self, message: dict) -> None:
+        """Event subscriber: queue the message's record, if it has one."""
+        record = event_record(message)
+        if record is not None:
+            self._put(record)
+
+    def record_snapshot(self, nodes: list[dict]) -> None:
+        for record in snapshot_records(nodes):
+            self._put(record)
+
+    def _put(self, record: dict) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if not self._dropping:
+                print("matter-events: record queue full; dropping events until writes catch up", file=sys.stderr, flush=True)
+                self._dropping = True
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Ask run() to write what is already queued and return."""
+        self._closing = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # run() is busy draining and stops once the queue is empty.
+            pass
+
+    async def run(self) -> None:
+        stopping = False
+        while not stopping:
+            if self._closing and self.queue.empty():
+                break
+            first = await self.queue.get()
+            if first is None:
+                break
+            batch = [first]
+            # Give a burst up to flush_sec to accumulate into one block.
+            deadline = time.monotonic() + self.flush_sec
+            while len(batch) < BATCH_MAX:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._write_with_retry(batch)
+
+    async def _write_with_retry(self, batch: list[dict]) -> None:
+        delay = WRITE_RETRY_SEC
+        while True:
+            try:
+                await asyncio.to_thread(self.write, batch)
+                if self._dropping and not self.queue.full():
+                    print(f"matter-events: writes caught up; {self.dropped} events dropped so far", file=sys.stderr, flush=True)
+                    self._dropping = False
+                return
+            except OSError as err:
+                if self._closing:
+                    print(f"matter-events: write failed while stopping, {len(batch)} events lost: {err}", file=sys.stderr, flush=True)
+                    return
+                print(f"matter-events: write failed, retrying in {delay:g}s: {err}", file=sys.stderr, flush=True)
+            except Exception as err:
+                # Not a disk problem, so a retry would fail the same way.
+                print(f"matter-events: cannot write batch, {len(batch)} events lost: {err!r}", file=sys.stderr, flush=True)
+                self._base = None
+                return
+            # A failed append leaves at most an unindexed tail, which readers
+            # never see; start a fresh segment for the retry all the same.
+            self._base = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WRITE_RETRY_MAX_SEC)
+
+    def write(self, records: list[dict]) -> None:
+        if not records:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._rotate_if_needed(float(records[0]["t"]))
+        payload = "".join(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n" for record in records)
+        block = gzip.compress(payload.encode("utf-8"), compresslevel=6)
+        with open(f"{self._base}.ndjson.gz", "ab") as handle:
+            offset = handle.tell()
+            handle.write(block)
+        entry = {
+            "t0": records[0]["t"],
+            "t1": records[-1]["t"],
+            "off": offset,
+            "len": len(block),
+            "n": len(records),
+            "nodes": f"{node_bitmap(record.get('node') for record in records):x}",
+        }
+        # Written after the data, so an indexed block is always complete.
+        with open(f"{self._base}.idx.ndjson", "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._segment_bytes = offset + len(block)
+        self.written += len(records)
+
+    def _rotate_if_needed(self, first_epoch: float) -> None:
+        if self._base is not None:
+            too_big = self._segment_bytes >= self.segment_bytes
+            too_old = first_epoch - self._segment_start >= self.segment_sec
+            if not (too_big or too_old):
+                return
+        self._base = os.path.join(self.directory, f"events-{int(first_epoch * 1000)}")
+        self._segment_start = first_epoch
+        self._segment_bytes = 0
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        """Drop the oldest segments while over the size budget or past the age limit."""
+        now_epoch = time.time()
+        segments = []
+        for _, base in segment_files(self.directory):
+            if base == self._base:
+                continue
+            try:
+                stat = os.stat(f"{base}.ndjson.gz")
+            except FileNotFoundError:
+                continue
+            # The last write is the newest event in the segment.
+            segments.append((base, stat.st_size, stat.st_mtime))
+        total = sum(size for _, size, _ in segments)
+        for base, size, last_write in segments:
+            if total <= self.retention_bytes and now_epoch - last_write <= self.retention_sec:
+                break
+            for suffix in (".ndjson.gz", ".idx.ndjson"):
+                try:
+                    os.unlink(f"{base}{suffix}")
+                except FileNotFoundError:
+                    pass
+            total -= size
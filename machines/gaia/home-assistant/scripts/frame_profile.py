@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import cProfile
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Per-phase timings for a redraw loop; nested phase() calls are charged
+# exclusive time, and work outside a frame is reported with add().
+WINDOW_FRAMES = 200
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(percentile / 100.0 * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+class FrameProfiler:
+    def __init__(
+        self,
+        enabled: bool = False,
+        *,
+        dump_path: str = "",
+        cprofile_path: str = "",
+        cprofile_frames: int = 0,
+    ):
+        self.enabled = enabled
+        self.frames = 0
+        self._samples: dict[str, deque[float]] = {}
+        self._totals: deque[float] = deque(maxlen=WINDOW_FRAMES)
+        self._current: dict[str, float] = {}
+        self._stack: list[list[float]] = []
+        self._frame_start: float | None = None
+        self._dump = open(dump_path, "a", encoding="utf-8") if enabled and dump_path else None
+        self._cprofile_path = cprofile_path
+        self._cprofile_left = cprofile_frames if enabled and cprofile_path else 0
+        self._cprofile = cProfile.Profile() if self._cprofile_left > 0 else None
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        # [start, time spent in nested phases]
+        entry = [time.perf_counter(), 0.0]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - entry[0]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            self.add(name, elapsed - entry[1])
+
+    def add(self, name: str, elapsed_sec: float) -> None:
+        if self.enabled:
+            self._current[name] = self._current.get(name, 0.0) + elapsed_sec
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._frame_start = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def end_frame(self) -> None:
+        if not self.enabled or self._frame_start is None:
+            return
+        total = time.perf_counter() - self._frame_start
+        self._frame_start = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile_left -= 1
+            if self._cprofile_left <= 0:
+                self._cprofile.dump_stats(self._cprofile_path)
+                self._cprofile = None
+        self.frames += 1
+        phases, self._current = self._current, {}
+        for name, elapsed in phases.items():
+            self._samples.setdefault(name, deque(maxlen=WINDOW_FRAMES)).append(elapsed)
+        self._totals.append(total)
+        if self._dump is not None:
+            record = {
+                "ts": round(time.time(), 3),
+                "frame": self.frames,
+                "total_ms": round(total * 1000.0, 3),
+                "phases_ms": {name: round(elapsed * 1000.0, 3) for name, elapsed in phases.items()},
+            }
+            self._dump.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._dump.flush()
+
+    def footer(self) -> str:
+        """One line of rolling p50/p99 per phase, in milliseconds."""
+        if not self.enabled or not self._totals:
+            return ""
+        parts = []
+        for name, samples in list(self._samples.items()) + [("frame", self._totals)]:
+            values = list(samples)
+            parts.append(f"{name} {_percentile(values, 50) * 1000.0:.1f}/{_percentile(values, 99) * 1000.0:.1f}")
+        return f"Profile ms p50/p99 ({len(self._totals)} frames): " + "  ".join(parts)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import re
+import time
+
+# Compact matter-health snapshots for "what changed since" runs. A snapshot
+# keeps one [hash, row] pair per node, where the hash covers every compared
+# field, so a diff touches only hashes except for nodes that actually moved:
+#   {"taken_epoch": t, "attributes": [path, ...], "nodes": {"<id>": [hash, row]}}
+COMPARED_FIELDS = ("available", "label", "mac", "vendor", "product", "attributes")
+BASELINE_NAME_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+def _compared(row: dict, attributes: list[str]) -> dict:
+    values = {field: row.get(field) for field in COMPARED_FIELDS}
+    row_attributes = row.get("attributes") or {}
+    values["attributes"] = {path: row_attributes.get(path) for path in attributes}
+    return values
+
+
+def row_hash(row: dict, attributes: list[str]) -> str:
+    encoded = json.dumps(_compared(row, attributes), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def build_snapshot(rows: list[dict], attributes: list[str]) -> dict:
+    return {
+        "taken_epoch": round(time.time(), 3),
+        "attributes": list(attributes),
+        "nodes": {str(row["node_id"]): [row_hash(row, attributes), row] for row in rows},
+    }
+
+
+def _node_order(row: dict) -> int:
+    node_id = row.get("node_id")
+    return node_id if isinstance(node_id, int) else 0
+
+
+def diff_snapshots(old: dict, new: dict) -> dict:
+    """Delta from old to new: added and removed rows, and per-field changes.
+
+    Attributes the baseline was not taken with are not compared; they are
+    listed under "not_in_baseline" instead of showing up as null -> value.
+    """
+    new_attributes = new.get("attributes") or []
+    old_attributes = old.get("attributes") or []
+    attributes = [path for path in new_attributes if path in old_attributes]
+    missing = [path for path in new_attributes if path not in old_attributes]
+    old_nodes = old.get("nodes") or {}
+    new_nodes = new.get("nodes") or {}
+    rehash_old = old_attributes != attributes
+    rehash_new = new_attributes != attributes
+    added, removed, changed = [], [], []
+    for key, (new_hash, new_row) in new_nodes.items():
+        previous = old_nodes.get(key)
+        if previous is None:
+            added.append(new_row)
+            continue
+        old_hash, old_row = previous
+        # Taken with other attributes of interest: compare only the shared ones.
+        if rehash_old:
+            old_hash = row_hash(old_row, attributes)
+        if rehash_new:
+            new_hash = row_hash(new_row, attributes)
+        if old_hash == new_hash:
+            continue
+        before, after = _compared(old_row, attributes), _compared(new_row, attributes)
+        changes = {}
+        for field in COMPARED_FIELDS:
+            if field == "attributes":
+                for path in attributes:
+                    if before["attributes"].get(path) != after["attributes"].get(path):
+                        changes[path] = [before["attributes"].get(path), after["attributes"].get(path)]
+            elif before[field] != after[field]:
+                changes[field] = [before[field], after[field]]
+        changed.append({"node_id": new_row["node_id"], "label": new_row.get("label") or "", "changes": changes})
+    for key, (_, old_row) in old_nodes.items():
+        if key not in new_nodes:
+            removed.append(old_row)
+    return {
+        "from_epoch": old.get("taken_epoch"),
+        "to_epoch": new.get("taken_epoch"),
+        "added": sorted(added, key=_node_order),
+        "removed": sorted(removed, key=_node_order),
+        "changed": sorted(changed, key=_node_order),
+        "not_in_baseline": missing,
+    }
+
+
+class SnapshotStore:
+    """Named snapshots, one JSON file each; "last" is the previous run."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        if not BASELINE_NAME_RE.match(name):
+            raise ValueError(f"invalid baseline name: {name!r}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, name: str) -> dict | None:
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def save(self, name: str, snapshot: dict) -> None:
+        path = self._path(name)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump(snapshot, handle, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp, path)
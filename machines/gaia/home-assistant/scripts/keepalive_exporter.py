@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+import asyncio
+import math
+
+import latency_histogram
+
+# Prometheus text exposition (format 0.0.4) of matter-keepalive's in-memory
+# state. Rendering only reads the dicts the scheduler already maintains.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+HEALTH_STATES = ("healthy", "degraded", "persistent")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Writer:
+    # Samples are grouped per metric family on output, so per-node loops can
+    # emit families in any order.
+    def __init__(self):
+        self._families: dict[str, tuple[str, str, list[str]]] = {}
+
+    def sample(self, name: str, kind: str, help_text: str, value: float, labels: dict | None = None, suffix: str = "") -> None:
+        family = self._families.setdefault(name, (kind, help_text, []))
+        family[2].append(f"{name}{suffix}{_labels(labels or {})} {_number(value)}")
+
+    def text(self) -> str:
+        lines = []
+        for name, (kind, help_text, samples) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def _node_labels(node_key: str, entry: dict) -> dict:
+    return {
+        "node_id": node_key,
+        "label": entry.get("label") or "",
+        "vendor": entry.get("vendor") or "",
+        "room": entry.get("room") or "",
+    }
+
+
+def render_metrics(metrics: dict[str, dict], histograms: dict[str, dict], runtime: dict, now_epoch: float) -> str:
+    out = _Writer()
+    out.sample("matter_keepalive_up", "gauge", "1 while connected to matter-server.", 1 if runtime.get("connected") else 0)
+    discovery_ms = runtime.get("discovery_ms")
+    if isinstance(discovery_ms, (int, float)):
+        out.sample(
+            "matter_keepalive_discovery_duration_seconds",
+            "gauge",
+            "Duration of the last start_listening node discovery.",
+            discovery_ms / 1000.0,
+        )
+    window = runtime.get("window") or {}
+    if window:
+        out.sample(
+            "matter_keepalive_pass_duration_seconds",
+            "gauge",
+            "Time from dispatching the last batch of due nodes to its last probe finishing.",
+            float(window.get("sweep_sec_last", 0.0)),
+        )
+        out.sample(
+            "matter_keepalive_pass_duration_max_seconds",
+            "gauge",
+            "Longest batch sweep in the last stats window.",
+            float(window.get("sweep_sec_max", 0.0)),
+        )
+        out.sample("matter_keepalive_pass_probes", "gauge", "Reads issued in the last stats window.", window.get("probes", 0))
+        out.sample("matter_keepalive_pass_mean_inflight", "gauge", "Mean reads in flight over the last stats window.", float(window.get("mean_inflight", 0.0)))
+
+    counters = runtime.get("counters") or {}
+    for node_key in sorted(metrics, key=lambda key: int(key) if key.isdigit() else 0):
+        entry = metrics[node_key]
+        if not isinstance(entry, dict):
+            continue
+        labels = _node_labels(node_key, entry)
+        for result, count in sorted((counters.get(node_key) or {}).items()):
+            out.sample(
+                "matter_keepalive_probes_total",
+                "counter",
+                "Keepalive acks by result (ok, fail, event).",
+                count,
+                {**labels, "result": result},
+            )
+        out.sample(
+            "matter_keepalive_consecutive_failures",
+            "gauge",
+            "Current run of failed keepalive reads.",
+            int(entry.get("consecutive_failures") or 0),
+            labels,
+        )
+        next_probe = entry.get("next_probe_epoch")
+        backoff = max(0.0, float(next_probe) - now_epoch) if isinstance(next_probe, (int, float)) else 0.0
+        out.sample("matter_keepalive_backoff_seconds", "gauge", "Time left in the failure backoff.", backoff, labels)
+        out.sample("matter_keepalive_degraded_score", "gauge", "Rolling degraded score.", int(entry.get("degraded_score") or 0), labels)
+        state = entry.get("health_state") or "healthy"
+        for candidate in HEALTH_STATES:
+            out.sample(
+                "matter_keepalive_health_state",
+                "gauge",
+                "1 for the node's current health state.",
+                1 if candidate == state else 0,
+                {**labels, "state": candidate},
+            )
+        rto_ms = entry.get("rto_ms")
+        if isinstance(rto_ms, (int, float)):
+            out.sample("matter_keepalive_read_timeout_seconds", "gauge", "Adaptive read timeout.", rto_ms / 1000.0, labels)
+        for window_name, summary in sorted((entry.get("latency_percentiles") or {}).items()):
+            for quantile in latency_histogram.PERCENTILES:
+                value = summary.get(f"p{quantile}")
+                if isinstance(value, (int, float)):
+                    out.sample(
+                        "matter_keepalive_latency_quantile_seconds",
+                        "gauge",
+                        "Probe latency percentile over a rolling window.",
+                        value / 1000.0,
+                        {**labels, "window": window_name, "quantile": _number(quantile / 100)},
+                    )
+
+        histogram = histograms.get(node_key)
+        totals = (histogram or {}).get("total") or {}
+        if not totals.get("count"):
+            continue
+        for upper_ms, count in latency_histogram.cumulative_buckets(histogram):
+            le = "+Inf" if upper_ms == math.inf else _number(upper_ms / 1000.0)
+            out.sample(
+                "matter_keepalive_probe_latency_seconds",
+                "histogram",
+                "Successful keepalive read latency.",
+                count,
+                {**labels, "le": le},
+                "_bucket",
+            )
+        for suffix, value in (("_sum", totals["sum_ms"] / 1000.0), ("_count", totals["count"])):
+            out.sample("matter_keepalive_probe_latency_seconds", "histogram", "", value, labels, suffix)
+    return out.text()
+
+
+async def serve_metrics(host: str, port: int, render) -> asyncio.AbstractServer:
+    """Serve render() at GET /metrics; anything else is a 404."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), timeout=5)
+                if header in {b"\r\n", b"\n", b""}:
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+            if len(parts) >= 2 and parts[0] == "GET" and path == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE, render().encode("utf-8")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import json
+import os
+import time
+
+# Append-only keepalive history, one NDJSON segment file per hour:
+#   raw-<hour_epoch>.ndjson     every probe result and health transition
+#   rollup-<hour_epoch>.ndjson  1-minute per-node aggregates of an old raw
+#                               segment, plus its transitions verbatim
+# Raw segments older than raw_retention_sec are rolled up and deleted;
+# rollups older than rollup_retention_sec are deleted.
+SEGMENT_SEC = 3600
+ROLLUP_SEC = 60
+
+
+def _segment_start(epoch: float) -> int:
+    return int(epoch - (epoch % SEGMENT_SEC))
+
+
+def _segment_files(directory: str, kind: str) -> list[tuple[int, str]]:
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    out = []
+    prefix = f"{kind}-"
+    for name in names:
+        if not name.startswith(prefix) or not name.endswith(".ndjson"):
+            continue
+        stamp = name[len(prefix):-len(".ndjson")]
+        if stamp.isdigit():
+            out.append((int(stamp), os.path.join(directory, name)))
+    return sorted(out)
+
+
+def _read_segment(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash mid-append can leave a torn last line.
+                    continue
+                if isinstance(record, dict):
+                    yield record
+    except FileNotFoundError:
+        return
+
+
+def _rollup_records(records) -> list[dict]:
+    minutes: dict[tuple[int, int], dict] = {}
+    transitions = []
+    for record in records:
+        if record.get("kind") == "state":
+            transitions.append(record)
+            continue
+        if record.get("kind") != "probe":
+            continue
+        epoch = float(record.get("t") or 0)
+        node_id = int(record.get("node") or 0)
+        minute = int(epoch - (epoch % ROLLUP_SEC))
+        bucket = minutes.setdefault(
+            (minute, node_id),
+            {"t": minute, "node": node_id, "kind": "rollup", "n": 0, "ok": 0, "event": 0, "ms_sum": 0.0, "ms_max": 0.0},
+        )
+        bucket["n"] += 1
+        if record.get("ok"):
+            bucket["ok"] += 1
+        if record.get("src") == "event":
+            bucket["event"] += 1
+        elif isinstance(record.get("ms"), (int, float)):
+            bucket["ms_sum"] += float(record["ms"])
+            bucket["ms_max"] = max(bucket["ms_max"], float(record["ms"]))
+        bucket["state"] = record.get("state")
+    for bucket in minutes.values():
+        bucket["ms_sum"] = round(bucket["ms_sum"], 1)
+    out = list(minutes.values()) + transitions
+    out.sort(key=lambda item: (float(item.get("t") or 0), int(item.get("node") or 0)))
+    return out
+
+
+class HistoryStore:
+    def __init__(self, directory: str, *, raw_retention_sec: float = 86400, rollup_retention_sec: float = 30 * 86400):
+        self.directory = directory
+        self.raw_retention_sec = raw_retention_sec
+        self.rollup_retention_sec = rollup_retention_sec
+
+    def append(self, records: list[dict]) -> None:
+        """Append records to their hourly raw segments; a pass is a few short lines."""
+        if not records:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        by_segment: dict[int, list[str]] = {}
+        for record in records:
+            line = json.dumps(record, separators=(",", ":"))
+            by_segment.setdefault(_segment_start(float(record["t"])), []).append(line)
+        for segment, lines in by_segment.items():
+            path = os.path.join(self.directory, f"raw-{segment}.ndjson")
+            with open(path, "a", encoding="utf-8") as handle:
+                handle.write("\n".join(lines) + "\n")
+
+    def compact(self, now_epoch: float | None = None) -> int:
+        """Roll up expired raw segments and drop expired rollups; returns files touched."""
+        now_epoch = time.time() if now_epoch is None else now_epoch
+        touched = 0
+        raw_horizon = now_epoch - self.raw_retention_sec
+        for segment, path in _segment_files(self.directory, "raw"):
+            if segment + SEGMENT_SEC > raw_horizon:
+                continue
+            rollup_path = os.path.join(self.directory, f"rollup-{segment}.ndjson")
+            tmp = f"{rollup_path}.tmp"
+            # Written whole and renamed before the raw segment goes away, so an
+            # interrupted compaction is simply redone on the next run.
+            with open(tmp, "w", encoding="utf-8") as handle:
+                for record in _rollup_records(_read_segment(path)):
+                    handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+            os.replace(tmp, rollup_path)
+            os.unlink(path)
+            touched += 1
+        rollup_horizon = now_epoch - self.rollup_retention_sec
+        for segment, path in _segment_files(self.directory, "rollup"):
+            if segment + SEGMENT_SEC <= rollup_horizon:
+                os.unlink(path)
+                touched += 1
+        return touched
+
+    def read(self, node_id: int | None = None, since_epoch: float = 0.0):
+        """Yield records oldest first, rollups for old hours and raw after."""
+        segments = _segment_files(self.directory, "rollup") + _segment_files(self.directory, "raw")
+        for segment, path in sorted(segments):
+            if segment + SEGMENT_SEC <= since_epoch:
+                continue
+            for record in _read_segment(path):
+                if node_id is not None and record.get("node") != node_id:
+                    continue
+                if float(record.get("t") or 0) < since_epoch:
+                    continue
+                yield record
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import json
+import os
+import time
+
+KEEPALIVE_LATENCY_FILE_DEFAULT = "/run/matter-keepalive-latency.json"
+# Windows appended to the .delta log before the snapshot is rewritten whole.
+COMPACT_EVERY_DEFAULT = 120
+
+
+# A snapshot file {"seq": n, "nodes": {...}, ...} plus "<path>.delta", one
+# line per write: {"seq": n, "top": {...}, "set": {key: entry}, "del": [key]}.
+# Readers apply delta lines with a seq above the snapshot's.
+class SnapshotDeltaWriter:
+    """Writes only the entries that changed since the last write."""
+
+    def __init__(self, path: str, compact_every: int = COMPACT_EVERY_DEFAULT):
+        self.path = path
+        self.delta_path = f"{path}.delta"
+        self.compact_every = max(1, compact_every)
+        self._written: dict[str, str] = {}
+        # Millisecond start keeps seq rising across restarts, so a reader
+        # never applies an old delta line to a newer snapshot.
+        self._seq = int(time.time() * 1000)
+        self._lines: int | None = None
+
+    def write(self, nodes: dict[str, dict], top: dict) -> None:
+        encoded = {key: json.dumps(entry, separators=(",", ":"), sort_keys=True) for key, entry in nodes.items()}
+        self._seq += 1
+        if self._lines is None or self._lines >= self.compact_every:
+            self._compact(nodes, top)
+        else:
+            line = {
+                "seq": self._seq,
+                "top": top,
+                "set": {key: nodes[key] for key, value in encoded.items() if self._written.get(key) != value},
+                "del": [key for key in self._written if key not in encoded],
+            }
+            with open(self.delta_path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(line, separators=(",", ":"), sort_keys=True) + "\n")
+            self._lines += 1
+        self._written = encoded
+
+    def _compact(self, nodes: dict[str, dict], top: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        for path, content in ((self.path, {**top, "seq": self._seq, "nodes": nodes}), (self.delta_path, None)):
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as handle:
+                if content is not None:
+                    json.dump(content, handle, separators=(",", ":"), sort_keys=True)
+            os.replace(tmp, path)
+        self._lines = 0
+
+
+class KeepaliveMetricsFile:
+    """Parsed keepalive latency snapshot plus its delta log.
+
+    A changed snapshot (inode, mtime or size) is re-parsed; otherwise only
+    delta lines appended since the last call are read.
+    """
+
+    def __init__(self, path: str = KEEPALIVE_LATENCY_FILE_DEFAULT):
+        self.path = path
+        self.data: dict = {}
+        self._signature: tuple[int, int, int] | None = None
+        self._seq = 0
+        self._delta_ino: int | None = None
+        self._delta_offset = 0
+
+    def _refresh(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.data = {}
+            self._signature = None
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            try:
+                with open(self.path, "r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+            except Exception:
+                # Keep the last good parse; retry on the next change.
+                return
+            self.data = data if isinstance(data, dict) else {}
+            self._signature = signature
+            self._seq = int(self.data.get("seq") or 0)
+            self._delta_ino = None
+        self._apply_deltas()
+
+    def _apply_deltas(self) -> None:
+        try:
+            handle = open(f"{self.path}.delta", "rb")
+        except OSError:
+            return
+        with handle:
+            ino = os.fstat(handle.fileno()).st_ino
+            if ino != self._delta_ino:
+                self._delta_ino, self._delta_offset = ino, 0
+            handle.seek(self._delta_offset)
+            chunk = handle.read()
+        # Only complete lines; a line being appended is picked up next time.
+        end = chunk.rfind(b"\n") + 1
+        self._delta_offset += end
+        nodes = self.data.setdefault("nodes", {})
+        for raw in chunk[:end].splitlines():
+            try:
+                line = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(line, dict) or int(line.get("seq") or 0) <= self._seq:
+                continue
+            self._seq = int(line["seq"])
+            self.data.update(line.get("top") or {})
+            nodes.update(line.get("set") or {})
+            for key in line.get("del") or ():
+                nodes.pop(key, None)
+
+    def load(self) -> dict[str, dict]:
+        """Per-node entries keyed by str(node_id)."""
+        self._refresh()
+        nodes = self.data.get("nodes")
+        return nodes if isinstance(nodes, dict) else {}
+
+    def window(self) -> dict:
+        self._refresh()
+        window = self.data.get("window")
+        return window if isinstance(window, dict) else {}
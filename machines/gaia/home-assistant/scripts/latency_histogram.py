@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import math
+
+# Log-bucketed (HDR-style) latency histogram with a fixed memory bound.
+# Each power of two between 1ms and 2^OCTAVES ms is split into SUB_BUCKETS
+# buckets (~19% relative error with 4); larger values land in the last bucket.
+SUB_BUCKETS = 4
+OCTAVES = 17
+BUCKET_COUNT = SUB_BUCKETS * OCTAVES + 1
+
+# Rolling windows as rings of time slices: (window seconds, slice seconds).
+# 5m keeps 5 x 1m slices, 1h keeps 12 x 5m, 24h keeps 24 x 1h.
+WINDOWS = {
+    "5m": (300, 60),
+    "1h": (3600, 300),
+    "24h": (86400, 3600),
+}
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_index(value_ms: float) -> int:
+    if value_ms <= 1.0:
+        return 0
+    return min(BUCKET_COUNT - 1, int(math.log2(value_ms) * SUB_BUCKETS))
+
+
+def bucket_upper_ms(index: int) -> float:
+    if index >= BUCKET_COUNT - 1:
+        return math.inf
+    return 2.0 ** ((index + 1) / SUB_BUCKETS)
+
+
+def new_histogram() -> dict:
+    # JSON-serialisable so it can be persisted as-is: per window a list of
+    # [slice_start_epoch, {bucket: count}, max_ms] oldest first, plus
+    # never-expiring totals for counter-style export.
+    histogram: dict = {name: [] for name in WINDOWS}
+    histogram["total"] = {"buckets": {}, "count": 0, "sum_ms": 0.0}
+    return histogram
+
+
+def record(histogram: dict, value_ms: float, now_epoch: float) -> None:
+    key = str(bucket_index(value_ms))
+    totals = histogram.setdefault("total", {"buckets": {}, "count": 0, "sum_ms": 0.0})
+    totals["buckets"][key] = totals["buckets"].get(key, 0) + 1
+    totals["count"] += 1
+    totals["sum_ms"] += value_ms
+    for name, (window_sec, slice_sec) in WINDOWS.items():
+        slices = histogram.setdefault(name, [])
+        slice_start = now_epoch - (now_epoch % slice_sec)
+        if not slices or slices[-1][0] != slice_start:
+            slices.append([slice_start, {}, 0.0])
+        current = slices[-1]
+        current[1][key] = current[1].get(key, 0) + 1
+        current[2] = max(current[2], value_ms)
+        horizon = now_epoch - window_sec
+        while slices and slices[0][0] + slice_sec <= horizon:
+            slices.pop(0)
+
+
+def summarize(histogram: dict, window: str, now_epoch: float) -> dict:
+    window_sec, slice_sec = WINDOWS[window]
+    horizon = now_epoch - window_sec
+    counts = [0] * BUCKET_COUNT
+    max_ms = 0.0
+    for slice_start, buckets, slice_max in histogram.get(window) or []:
+        if slice_start + slice_sec <= horizon:
+            continue
+        for key, count in buckets.items():
+            counts[int(key)] += count
+        max_ms = max(max_ms, slice_max)
+    total = sum(counts)
+    out: dict = {"count": total}
+    if total == 0:
+        return out
+    for percentile in PERCENTILES:
+        rank = math.ceil(total * percentile / 100.0)
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                # Report the bucket's upper bound, but never above the
+                # largest value actually seen.
+                out[f"p{percentile}"] = min(bucket_upper_ms(index), max_ms)
+                break
+    out["max"] = max_ms
+    return out
+
+
+def summarize_all(histogram: dict, now_epoch: float) -> dict:
+    return {window: summarize(histogram, window, now_epoch) for window in WINDOWS}
+
+
+def cumulative_buckets(histogram: dict, step: int = SUB_BUCKETS) -> list[tuple[float, int]]:
+    """(upper_bound_ms, cumulative count) over the totals, every step-th bucket.
+
+    The default step keeps one bound per power of two, which is plenty for a
+    Prometheus histogram and keeps the series count per node small.
+    """
+    totals = (histogram.get("total") or {}).get("buckets") or {}
+    counts = [0] * BUCKET_COUNT
+    for key, count in totals.items():
+        counts[int(key)] += count
+    out = []
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if index == BUCKET_COUNT - 1 or (index + 1) % step == 0:
+            out.append((bucket_upper_ms(index), seen))
+    return out
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from event_log import read_records, segment_files
+
+EVENTS_DIR_DEFAULT = "/var/lib/matter-events"
+REPLAY_LISTEN_DEFAULT = "127.0.0.1:5590"
+RELATIVE_TIME_RE = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+STATS_BUCKETS = {"hour": 3600, "day": 86400}
+AVAILABILITY_EVENTS = {"snapshot", "node_added", "node_updated", "node_removed"}
+
+
+def _parse_time(text: str, now_epoch: float) -> float:
+    """Epoch seconds, a relative age like 90m or 7d, HH:MM today, or ISO 8601."""
+    text = text.strip()
+    if re.fullmatch(r"\d+(\.\d+)?", text) and len(text) >= 9:
+        return float(text)
+    relative = RELATIVE_TIME_RE.match(text)
+    if relative:
+        return now_epoch - float(relative.group(1)) * RELATIVE_UNITS[relative.group(2)]
+    if re.fullmatch(r"\d{1,2}:\d{2}", text):
+        hour, minute = (int(part) for part in text.split(":"))
+        return datetime.fromtimestamp(now_epoch).replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _matches(record: dict, args: argparse.Namespace) -> bool:
+    if args.event and record.get("event") not in args.event:
+        return False
+    if args.cluster is not None and record.get("cluster") != args.cluster:
+        return False
+    return True
+
+
+def _text_line(record: dict) -> str:
+    ts = datetime.fromtimestamp(float(record.get("t") or 0)).isoformat(timespec="milliseconds")
+    event = record.get("event")
+    parts = [ts, str(event), f"node={record.get('node')}"]
+    if event == "attribute_updated":
+        parts.append(f"path={record.get('path')} value={json.dumps(record.get('value'))}")
+    elif event == "node_event":
+        data = record.get("data") or {}
+        parts.append(
+            f"ep={record.get('endpoint')} cluster={record.get('cluster')} event={record.get('event_id')} "
+            f"event_no={data.get('event_number')} payload={data.get('data')}"
+        )
+    elif "available" in record:
+        parts.append(f"available={record['available']}")
+    return " ".join(parts)
+
+
+def _print_stats(records, bucket_sec: int) -> None:
+    counts: dict[tuple[int, object, str], int] = {}
+    for record in records:
+        t = float(record.get("t") or 0)
+        key = (int(t - (t % bucket_sec)), record.get("node"), str(record.get("event")))
+        counts[key] = counts.get(key, 0) + 1
+    print("bucket\tnode\tevent\tcount")
+    for (bucket, node, event), count in sorted(counts.items(), key=lambda item: (item[0][0], str(item[0][1]), item[0][2])):
+        print(f"{datetime.fromtimestamp(bucket).isoformat(timespec='minutes')}\t{node}\t{event}\t{count}")
+
+
+def _replay_message(record: dict, nodes: dict[int, dict]) -> dict | None:
+    """The matter-server event a record came from, as far as it was recorded.
+
+    Only availability is recorded for node_added/node_updated, so the
+    replayed node carries the attributes replayed so far, not the full set.
+    """
+    event = record.get("event")
+    node_id = record.get("node")
+    node = nodes.get(node_id) if isinstance(node_id, int) else None
+    if event == "attribute_updated":
+        if node is not None:
+            node["attributes"][record.get("path")] = record.get("value")
+        return {"event": event, "data": [node_id, record.get("path"), record.get("value")]}
+    if event == "node_event":
+        return {"event": event, "data": record.get("data") or {}}
+    if event in {"node_added", "node_updated"} and isinstance(node_id, int):
+        node = nodes.setdefault(node_id, {"node_id": node_id, "available": True, "attributes": {}})
+        node["available"] = bool(record.get("available"))
+        return {"event": event, "data": json.loads(json.dumps(node))}
+    if event == "node_removed":
+        nodes.pop(node_id, None)
+        return {"event": event, "data": node_id}
+    return None
+
+
+def _availability_before(directory: str, since: float, nodes: set[int]) -> dict[int, bool]:
+    """Node availability at since, from the latest snapshot before it and the events after that."""
+    records: list[dict] = []
+    until = since
+    # Walk back a segment at a time until one holds a snapshot.
+    for start_ms, _ in reversed(segment_files(directory)):
+        start = start_ms / 1000.0
+        if start >= until:
+            continue
+        chunk = [
+            record
+            for record in read_records(directory, since=start, until=until, nodes=nodes)
+            if record.get("event") in AVAILABILITY_EVENTS
+        ]
+        records = chunk + records
+        until = start
+        if any(record.get("event") == "snapshot" for record in chunk):
+            break
+    available: dict[int, bool] = {}
+    snapshot_t = None
+    for record in records:
+        node_id = record.get("node")
+        if not isinstance(node_id, int):
+            continue
+        if record.get("event") == "snapshot":
+            if record.get("t") != snapshot_t:
+                # Each reconnect snapshot lists every node and replaces the last.
+                available, snapshot_t = {}, record.get("t")
+            available[node_id] = bool(record.get("available"))
+        elif record.get("event") == "node_removed":
+            available.pop(node_id, None)
+        else:
+            available[node_id] = bool(record.get("available"))
+    return available
+
+
+def _initial_nodes(records: list[dict], baseline: dict[int, bool]) -> dict[int, dict]:
+    # Availability at the start of the window, then recorded snapshots, seed
+    # the start_listening reply; nodes only seen in events start out
+    # available with no attributes.
+    nodes: dict[int, dict] = {
+        node_id: {"node_id": node_id, "available": available, "attributes": {}} for node_id, available in baseline.items()
+    }
+    for record in records:
+        node_id = record.get("node")
+        if not isinstance(node_id, int) or node_id in nodes:
+            continue
+        available = record.get("available") if record.get("event") == "snapshot" else True
+        nodes[node_id] = {"node_id": node_id, "available": bool(available), "attributes": {}}
+    return nodes
+
+
+async def _replay(records: list[dict], baseline: dict[int, bool], listen: str, speed: float) -> int:
+    """Serve the records as a matter-server stand-in; every client gets its own replay."""
+    import websockets
+
+    host, _, port = listen.rpartition(":")
+    events = [record for record in records if record.get("event") != "snapshot"]
+
+    async def stream(ws, nodes: dict[int, dict]) -> None:
+        previous = float(events[0]["t"]) if events else 0.0
+        for record in events:
+            t = float(record["t"])
+            if speed > 0 and t > previous:
+                await asyncio.sleep((t - previous) / speed)
+            previous = t
+            message = _replay_message(record, nodes)
+            if message is not None:
+                await ws.send(json.dumps(message))
+        print(f"replayed {len(events)} events to a client", file=sys.stderr)
+
+    async def handle(ws) -> None:
+        nodes = _initial_nodes(records, baseline)
+        streamer: asyncio.Task | None = None
+        await ws.send(json.dumps({"fabric_id": 0, "schema_version": 11, "replay": True}))
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                message_id = message.get("message_id")
+                command = message.get("command")
+                args = message.get("args") or {}
+                if command == "start_listening":
+                    await ws.send(json.dumps({"message_id": message_id, "result": list(nodes.values())}))
+                    if streamer is None:
+                        streamer = asyncio.create_task(stream(ws, nodes))
+                elif command == "read_attribute":
+                    node = nodes.get(args.get("node_id")) or {}
+                    path = args.get("attribute_path")
+                    if path in (node.get("attributes") or {}):
+                        await ws.send(json.dumps({"message_id": message_id, "result": {path: node["attributes"][path]}}))
+                    else:
+                        await ws.send(json.dumps({"message_id": message_id, "error_code": 0, "details": "not in recording"}))
+                else:
+                    await ws.send(json.dumps({"message_id": message_id, "error_code": 0, "details": f"{command} not supported in replay"}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if streamer is not None:
+                streamer.cancel()
+
+    async with websockets.serve(handle, host or "127.0.0.1", int(port), max_size=None):
+        print(f"replaying {len(events)} events on ws://{host or '127.0.0.1'}:{port}/ws at {speed or 'max'}x", file=sys.stderr)
+        await asyncio.Future()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query, summarise or replay events recorded by matter-events --record.")
+    parser.add_argument("--dir", default=os.getenv("MATTER_EVENTS_DIR", EVENTS_DIR_DEFAULT))
+    parser.add_argument("--since", help="Epoch, age (90m, 7d), HH:MM today, or ISO time.")
+    parser.add_argument("--until", help="Same forms as --since; exclusive.")
+    parser.add_argument("--node", type=int, action="append", help="Only this node id; repeatable.")
+    parser.add_argument("--cluster", type=int)
+    parser.add_argument("--event", action="append", help="Only this event type (node_event, attribute_updated, node_updated, ...); repeatable.")
+    parser.add_argument("--format", choices=("text", "ndjson"), default="text")
+    parser.add_argument("--stats", choices=tuple(STATS_BUCKETS), help="Count events per node and type per hour or day.")
+    parser.add_argument("--replay", action="store_true", help="Serve the selected events as a matter-server websocket stand-in.")
+    parser.add_argument("--listen", default=REPLAY_LISTEN_DEFAULT, help="host:port for --replay.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier; 0 replays without delays.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Report how many index blocks were read.")
+    args = parser.parse_args()
+
+    now_epoch = time.time()
+    try:
+        since = _parse_time(args.since, now_epoch) if args.since else None
+        until = _parse_time(args.until, now_epoch) if args.until else None
+    except ValueError as err:
+        parser.error(str(err))
+
+    counters: dict = {}
+    records = read_records(args.dir, since=since, until=until, nodes=set(args.node or ()), counters=counters)
+
+    if args.replay:
+        # Availability snapshots seed the stand-in's node list whatever the filters.
+        selected = [record for record in records if record.get("event") == "snapshot" or _matches(record, args)]
+        baseline = _availability_before(args.dir, since, set(args.node or ())) if since is not None else {}
+        return asyncio.run(_replay(selected, baseline, args.listen, args.speed))
+
+    records = (record for record in records if _matches(record, args))
+    try:
+        if args.stats:
+            _print_stats(records, STATS_BUCKETS[args.stats])
+        else:
+            for record in records:
+                print(json.dumps(record, ensure_ascii=False) if args.format == "ndjson" else _text_line(record))
+    except BrokenPipeError:
+        return 0
+    if args.verbose:
+        print(f"read {counters.get('blocks_read', 0)} of {counters.get('blocks', 0)} index blocks", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,12 +4,21 @@ import asyncio
 import base64
 import json
 import os
+import signal
 import sys
 from datetime import datetime
 
-import websockets
+from event_log import (
+    RETENTION_BYTES_DEFAULT,
+    RETENTION_SEC_DEFAULT,
+    SEGMENT_BYTES_DEFAULT,
+    SEGMENT_SEC_DEFAULT,
+    EventRecorder,
+)
+from matter_client import MatterClient, start_listening
 
 WS_URL_DEFAULT = "ws://127.0.0.1:5580/ws"
+RECORD_RECONNECT_SEC = 5.0
 
 
 def _b64_to_bytes(value: str) -> bytes | None:
@@ -29,15 +38,54 @@ def _mac_from_attrs(attrs: dict) -> str | None:
     return None
 
 
-async def _call(ws, message_id: str, command: str, args: dict | None = None) -> dict:
-    payload = {"message_id": message_id, "command": command, "args": args or {}}
-    await ws.send(json.dumps(payload))
-    while True:
-        message = json.loads(await ws.recv())
-        if message.get("event"):
-            continue
-        if message.get("message_id") == message_id:
-            return message
+async def _record(args: argparse.Namespace) -> int:
+    recorder = EventRecorder(
+        args.record,
+        segment_bytes=args.segment_mib * 1024 * 1024,
+        segment_sec=args.segment_minutes * 60,
+        retention_bytes=args.retention_mib * 1024 * 1024,
+        retention_sec=args.retention_days * 86400,
+    )
+    writer = asyncio.create_task(recorder.run())
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"recording events to {args.record}", flush=True)
+    # The writer only ends early on a bug; stop then and exit non-zero so
+    # systemd restarts the recorder instead of queueing into the void.
+    writer.add_done_callback(lambda _: stop.set())
+    while not stop.is_set():
+        try:
+            async with MatterClient(args.ws_url, message_prefix="events") as client:
+                # The subscriber only queues; compression and disk writes
+                # happen in the recorder task.
+                client.subscribe(recorder.record)
+                recorder.record_snapshot(await start_listening(client))
+                closed = asyncio.create_task(client.wait_closed())
+                stopped = asyncio.create_task(stop.wait())
+                await asyncio.wait({closed, stopped}, return_when=asyncio.FIRST_COMPLETED)
+                closed.cancel()
+                stopped.cancel()
+            if not stop.is_set():
+                print("matter-server connection closed; reconnecting", file=sys.stderr)
+        except Exception as err:
+            print(f"matter-events: {err}", file=sys.stderr)
+        if not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=RECORD_RECONNECT_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    recorder.close()
+    try:
+        await writer
+    except Exception as err:
+        print(f"matter-events: recorder failed: {err!r}", file=sys.stderr)
+        return 1
+    print(f"recorded {recorder.written} events, dropped {recorder.dropped}", file=sys.stderr)
+    return 0
 
 
 async def _run() -> int:
@@ -47,21 +95,27 @@ async def _run() -> int:
     parser.add_argument("--node-id", type=int)
     parser.add_argument("--all", action="store_true", help="Do not filter to one remote.")
     parser.add_argument("--raw", action="store_true", help="Print raw JSON events.")
+    parser.add_argument("--record", metavar="DIR", help="Append every event to compressed, indexed segments in DIR.")
+    parser.add_argument("--segment-mib", type=int, default=SEGMENT_BYTES_DEFAULT // (1024 * 1024))
+    parser.add_argument("--segment-minutes", type=int, default=SEGMENT_SEC_DEFAULT // 60)
+    parser.add_argument("--retention-mib", type=int, default=RETENTION_BYTES_DEFAULT // (1024 * 1024))
+    parser.add_argument("--retention-days", type=int, default=RETENTION_SEC_DEFAULT // 86400)
     args = parser.parse_args()
 
+    if args.record:
+        return await _record(args)
+
     if not args.all and args.node_id is None and args.remote_mac is None:
         args.all = True
 
-    async with websockets.connect(args.ws_url, max_size=None) as ws:
-        await ws.recv()  # server_info
-
-        start = await _call(ws, "start", "start_listening")
-        if "error_code" in start:
-            details = start.get("details") or "unknown error"
-            print(f"start_listening failed: {details}", file=sys.stderr)
+    async with MatterClient(args.ws_url, message_prefix="events") as client:
+        events = client.event_queue()
+        try:
+            nodes = await start_listening(client)
+        except RuntimeError as err:
+            print(str(err), file=sys.stderr)
             return 1
 
-        nodes = start.get("result") or []
         node_by_id = {}
         target_node_id = args.node_id
 
@@ -93,7 +147,10 @@ async def _run() -> int:
             )
 
         while True:
-            message = json.loads(await ws.recv())
+            message = await events.get()
+            if message is None:
+                print("matter-server connection closed", file=sys.stderr)
+                return 1
             if message.get("event") != "node_event":
                 continue
 
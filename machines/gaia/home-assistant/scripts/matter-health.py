@@ -1,70 +1,331 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
-import base64
 import json
 import os
+import socket
 import sys
+import time
 
-import websockets
+from health_snapshot import SnapshotStore, build_snapshot, diff_snapshots
+from keepalive_metrics import KEEPALIVE_LATENCY_FILE_DEFAULT, KeepaliveMetricsFile
+from matter_node_store import NodeStore
+from matter_rooms import mac_from_attrs
+from matter_thread import is_always_on_thread_node
 
 WS_URL_DEFAULT = "ws://127.0.0.1:5580/ws"
+HEALTH_SOCKET_DEFAULT = "/run/matter-health/health.sock"
+HEALTH_QUERY_TIMEOUT_SEC = 2.0
+HEALTH_RECONNECT_SEC = 5.0
+HEALTH_STATE_DIR_DEFAULT = os.path.join(
+    os.getenv("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"),
+    "matter-health",
+)
+# Attributes compared by --diff besides availability, label and MAC:
+# SoftwareVersionString and the Thread RoutingRole.
+HEALTH_DIFF_ATTRIBUTES_DEFAULT = "0/40/10,0/53/1"
 
 
-def _b64_to_bytes(value: str) -> bytes | None:
+def _node_row(node: dict) -> dict:
+    attrs = node.get("attributes") or {}
+    node_id = node.get("node_id")
+    return {
+        "node_id": node_id,
+        "available": bool(node.get("available")),
+        "label": str(attrs.get("0/40/5") or ""),
+        "mac": mac_from_attrs(attrs) or "",
+        "vendor": str(attrs.get("0/40/1") or ""),
+        "product": str(attrs.get("0/40/3") or ""),
+        # The keepalive policy, so sleepy remotes never count as offline.
+        "thread": isinstance(node_id, int) and is_always_on_thread_node(node_id, attrs),
+    }
+
+
+def _with_attributes(rows: list[dict], nodes: dict[int, dict], paths: list[str]) -> list[dict]:
+    out = []
+    for row in rows:
+        attrs = (nodes.get(row["node_id"]) or {}).get("attributes") or {}
+        out.append({**row, "attributes": {path: attrs.get(path) for path in paths}})
+    return out
+
+
+def _select_rows(rows: list[dict], query: dict) -> list[dict]:
+    """Rows matching a query: {"available": bool, "thread_only": bool, "vendors": [substring, ...]}."""
+    available = query.get("available")
+    thread_only = bool(query.get("thread_only"))
+    vendors = [str(vendor).lower() for vendor in query.get("vendors") or ()]
+    out = []
+    for row in rows:
+        if isinstance(available, bool) and row["available"] != available:
+            continue
+        if thread_only and not row["thread"]:
+            continue
+        if vendors and not any(vendor in row["vendor"].lower() for vendor in vendors):
+            continue
+        out.append(row)
+    return out
+
+
+class _HealthDaemon:
+    """Node availability kept current from the matter-server event stream.
+
+    Answers one JSON query per line on a Unix socket. Rows are rebuilt only
+    when the store version moves, so a query is a filter over a cached list.
+    """
+
+    def __init__(self, ws_url: str):
+        self.ws_url = ws_url
+        self.connected = False
+        self.store = NodeStore()
+        self._rows: list[dict] = []
+        self._rows_version = -1
+
+    def rows(self) -> list[dict]:
+        if self._rows_version != self.store.version:
+            self._rows = [_node_row(node) for _, node in sorted(self.store.nodes.items())]
+            self._rows_version = self.store.version
+        return self._rows
+
+    def answer(self, query) -> dict:
+        if not isinstance(query, dict):
+            return {"error": "query must be a JSON object"}
+        if not self.connected:
+            return {"error": "not connected to matter-server"}
+        rows = _select_rows(self.rows(), query)
+        if query.get("count"):
+            return {"count": len(rows)}
+        paths = [str(path) for path in query.get("attributes") or ()]
+        if paths:
+            rows = _with_attributes(rows, self.store.nodes, paths)
+        return {"nodes": rows}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    response = self.answer(json.loads(line))
+                except ValueError:
+                    response = {"error": "invalid JSON"}
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self) -> None:
+        from matter_client import MatterClient, start_listening
+
+        while True:
+            try:
+                async with MatterClient(self.ws_url, message_prefix="health") as client:
+                    client.subscribe(self.store.apply)
+                    self.store.load(await start_listening(client))
+                    self.connected = True
+                    await client.wait_closed()
+                print("matter-health: connection closed; reconnecting", file=sys.stderr)
+            except Exception as err:
+                print(f"matter-health: {err}", file=sys.stderr)
+            finally:
+                self.connected = False
+            await asyncio.sleep(HEALTH_RECONNECT_SEC)
+
+
+async def _serve(ws_url: str, socket_path: str) -> int:
+    daemon = _HealthDaemon(ws_url)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # Created 0660 rather than chmod'ed after bind.
+    umask = os.umask(0o117)
+    try:
+        server = await asyncio.start_unix_server(daemon.handle, socket_path)
+    finally:
+        os.umask(umask)
+    async with server:
+        await daemon.run()
+    return 0
+
+
+def _query_daemon(socket_path: str, query: dict) -> dict | None:
+    """One query against a running --serve instance; None when it cannot answer."""
     try:
-        return base64.b64decode(value + "===")
-    except Exception:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(HEALTH_QUERY_TIMEOUT_SEC)
+            sock.connect(socket_path)
+            sock.sendall((json.dumps(query) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as handle:
+                line = handle.readline()
+        response = json.loads(line)
+    except (OSError, ValueError):
         return None
+    if not isinstance(response, dict) or "error" in response:
+        return None
+    return response
 
 
-def _mac_from_attrs(attrs: dict) -> str | None:
-    for entry in (attrs.get("0/51/0") or []):
-        hw = entry.get("4")
-        if isinstance(hw, str) and hw:
-            decoded = _b64_to_bytes(hw)
-            if decoded and len(decoded) >= 6:
-                return ":".join(f"{byte:02x}" for byte in decoded[:6])
-    return None
+async def _direct_nodes(ws_url: str) -> dict[int, dict]:
+    # Imported here so the daemon path never pays for loading websockets.
+    from matter_client import MatterClient, start_listening
 
+    async with MatterClient(ws_url, message_prefix="health") as client:
+        nodes = await start_listening(client)
+    return {node.get("node_id", 0): node for node in sorted(nodes, key=lambda n: n.get("node_id", 0))}
+
+
+def _with_keepalive(rows: list[dict], keepalive: dict[str, dict]) -> list[dict]:
+    now_epoch = time.time()
+    out = []
+    for row in rows:
+        entry = keepalive.get(str(row["node_id"])) or {}
+        last_ack = entry.get("last_ack_epoch")
+        ack_age = int(now_epoch - float(last_ack)) if isinstance(last_ack, (int, float)) else None
+        out.append({**row, "health": entry.get("health_state") or "", "ack_age_sec": ack_age})
+    return out
 
-async def _call(ws, message_id: str, command: str, args: dict | None = None) -> dict:
-    payload = {"message_id": message_id, "command": command, "args": args or {}}
-    await ws.send(json.dumps(payload))
-    while True:
-        message = json.loads(await ws.recv())
-        if message.get("event"):
-            continue
-        if message.get("message_id") == message_id:
-            return message
 
+def _print_tsv(rows: list[dict], keepalive: bool) -> None:
+    header = "node_id\tavailable\tlabel\tmac\tvendor\tproduct"
+    # Extra columns go last so existing awk consumers keep their fields.
+    print(f"{header}\thealth\tack_age_sec" if keepalive else header)
+    for row in rows:
+        label = row["label"].replace("\t", " ")
+        vendor = row["vendor"].replace("\t", " ")
+        product = row["product"].replace("\t", " ")
+        line = f"{row['node_id']}\t{row['available']}\t{label}\t{row['mac']}\t{vendor}\t{product}"
+        if keepalive:
+            ack_age = "" if row["ack_age_sec"] is None else str(row["ack_age_sec"])
+            line = f"{line}\t{row['health']}\t{ack_age}"
+        print(line)
 
-async def _run() -> int:
+
+def _print_rows(rows: list[dict], fmt: str, keepalive: bool) -> None:
+    if fmt == "json":
+        print(json.dumps(rows, ensure_ascii=False))
+    elif fmt == "ndjson":
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+    else:
+        _print_tsv(rows, keepalive)
+
+
+def _print_delta(delta: dict, fmt: str) -> None:
+    if fmt == "json":
+        print(json.dumps(delta, ensure_ascii=False))
+        return
+    if delta.get("not_in_baseline"):
+        print(f"matter-health: not in baseline, not compared: {', '.join(delta['not_in_baseline'])}", file=sys.stderr)
+    records = (
+        [("added", row) for row in delta["added"]]
+        + [("removed", row) for row in delta["removed"]]
+        + [("changed", change) for change in delta["changed"]]
+    )
+    records.sort(key=lambda item: item[1]["node_id"])
+    for kind, record in records:
+        if fmt == "ndjson":
+            print(json.dumps({"change": kind, **record}, ensure_ascii=False))
+        elif kind == "changed":
+            parts = [f"{field} {json.dumps(old)} -> {json.dumps(new)}" for field, (old, new) in record["changes"].items()]
+            print(f"~ {record['node_id']}\t{record['label']}\t" + "; ".join(parts))
+        else:
+            mark = "+" if kind == "added" else "-"
+            print(f"{mark} {record['node_id']}\t{record['label']}\tavailable={record['available']}\t{record['vendor']} {record['product']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="List Matter nodes.")
+    parser.add_argument("--format", choices=("tsv", "json", "ndjson"), default="tsv")
+    parser.add_argument("--available", choices=("true", "false"), help="Only nodes with this availability.")
+    parser.add_argument("--thread-only", action="store_true", help="Only always-on Thread nodes (keepalive policy: forced nodes, no sleepy products).")
+    parser.add_argument("--vendor", action="append", default=[], help="Only vendors containing this (case-insensitive); repeatable.")
+    parser.add_argument("--count", action="store_true", help="Print the number of matching nodes instead of the nodes.")
+    parser.add_argument("--keepalive", action="store_true", help="Append keepalive health and ack age columns.")
+    parser.add_argument("--diff", action="store_true", help="Print only nodes that changed since --baseline, then save this run as 'last'.")
+    parser.add_argument("--baseline", default="last", help="Snapshot --diff compares against (default: the previous --diff run).")
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save this run's snapshot under NAME.")
+    parser.add_argument(
+        "--attribute",
+        action="append",
+        metavar="PATH",
+        help="Attribute path compared by --diff; repeatable (default: MATTER_HEALTH_DIFF_ATTRIBUTES or "
+        f"{HEALTH_DIFF_ATTRIBUTES_DEFAULT}).",
+    )
+    parser.add_argument("--delta-out", metavar="FILE", help="With --diff, also write the delta as JSON to FILE.")
+    parser.add_argument("--state-dir", default=os.getenv("MATTER_HEALTH_STATE_DIR", HEALTH_STATE_DIR_DEFAULT))
+    parser.add_argument(
+        "--keepalive-latency-file",
+        default=os.getenv("MATTER_KEEPALIVE_LATENCY_FILE", KEEPALIVE_LATENCY_FILE_DEFAULT),
+    )
+    parser.add_argument("--socket", default=os.getenv("MATTER_HEALTH_SOCKET", HEALTH_SOCKET_DEFAULT))
+    parser.add_argument("--serve", action="store_true", help="Keep node health current and answer queries on --socket.")
+    parser.add_argument("--direct", action="store_true", help="Query matter-server directly, not a running --serve instance.")
+    args = parser.parse_args()
     ws_url = os.getenv("MATTER_WS_URL", WS_URL_DEFAULT)
 
-    async with websockets.connect(ws_url, max_size=None) as ws:
-        await ws.recv()  # server_info
+    if args.serve:
+        return asyncio.run(_serve(ws_url, args.socket))
+    snapshot_mode = args.diff or bool(args.save_baseline)
+    if args.count and snapshot_mode:
+        parser.error("--count cannot be combined with --diff or --save-baseline")
+    attributes = args.attribute or [
+        path.strip()
+        for path in os.getenv("MATTER_HEALTH_DIFF_ATTRIBUTES", HEALTH_DIFF_ATTRIBUTES_DEFAULT).split(",")
+        if path.strip()
+    ]
 
-        start = await _call(ws, "start", "start_listening")
-        if "error_code" in start:
-            details = start.get("details") or "unknown error"
-            print(f"start_listening failed: {details}", file=sys.stderr)
+    query: dict = {"thread_only": args.thread_only, "vendors": args.vendor, "count": args.count}
+    if args.available:
+        query["available"] = args.available == "true"
+    if snapshot_mode:
+        query["attributes"] = attributes
+    response = None if args.direct else _query_daemon(args.socket, query)
+    if response is None:
+        try:
+            nodes = asyncio.run(_direct_nodes(ws_url))
+        except RuntimeError as err:
+            print(str(err), file=sys.stderr)
             return 1
+        except OSError as err:
+            print(f"matter-health: cannot reach matter-server at {ws_url}: {err}", file=sys.stderr)
+            return 1
+        rows = _select_rows([_node_row(node) for node in nodes.values()], query)
+        if snapshot_mode:
+            rows = _with_attributes(rows, nodes, attributes)
+        response = {"count": len(rows)} if args.count else {"nodes": rows}
 
-        nodes = start.get("result") or []
-        print("node_id\tavailable\tlabel\tmac\tvendor\tproduct")
-
-        for node in sorted(nodes, key=lambda n: n.get("node_id", 0)):
-            node_id = node.get("node_id")
-            available = bool(node.get("available"))
-            attrs = node.get("attributes") or {}
-            label = (attrs.get("0/40/5") or "").replace("\t", " ")
-            vendor = (attrs.get("0/40/1") or "").replace("\t", " ")
-            product = (attrs.get("0/40/3") or "").replace("\t", " ")
-            mac = _mac_from_attrs(attrs) or ""
-            print(f"{node_id}\t{available}\t{label}\t{mac}\t{vendor}\t{product}")
+    if snapshot_mode:
+        snapshots = SnapshotStore(args.state_dir)
+        try:
+            current = build_snapshot(response.get("nodes") or [], attributes)
+            if args.save_baseline:
+                snapshots.save(args.save_baseline, current)
+            if not args.diff:
+                return 0
+            baseline = snapshots.load(args.baseline)
+            snapshots.save("last", current)
+        except (OSError, ValueError) as err:
+            print(f"matter-health: {err}", file=sys.stderr)
+            return 1
+        if baseline is None:
+            print(f"matter-health: no '{args.baseline}' snapshot yet; saved this run as 'last'", file=sys.stderr)
+            return 0
+        delta = diff_snapshots(baseline, current)
+        if args.delta_out:
+            with open(args.delta_out, "w", encoding="utf-8") as handle:
+                json.dump(delta, handle, ensure_ascii=False)
+                handle.write("\n")
+        _print_delta(delta, args.format)
+        return 0
 
+    if args.count:
+        count = int(response.get("count") or 0)
+        print(count if args.format == "tsv" else json.dumps({"count": count}))
+        return 0
+    rows = response.get("nodes") or []
+    if args.keepalive:
+        rows = _with_keepalive(rows, KeepaliveMetricsFile(args.keepalive_latency_file).load())
+    _print_rows(rows, args.format, args.keepalive)
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(asyncio.run(_run()))
+    raise SystemExit(main())
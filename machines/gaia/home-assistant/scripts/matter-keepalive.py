@@ -1,18 +1,48 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
 import base64
+import heapq
+import itertools
 import json
 import os
+import random
 import sys
 import time
 
-import websockets
+import latency_histogram
+from keepalive_exporter import render_metrics, serve_metrics
+from keepalive_history import HistoryStore
+from keepalive_metrics import KEEPALIVE_LATENCY_FILE_DEFAULT, KeepaliveMetricsFile, SnapshotDeltaWriter
+from matter_client import MatterClient, start_listening
+from matter_rooms import load_rooms_from_env, room_for_attrs
+from matter_thread import is_always_on_thread_node, is_forced_node
 
 WS_URL_DEFAULT = "ws://127.0.0.1:5580/ws"
 KEEPALIVE_INTERVAL_SEC = int(os.getenv("MATTER_KEEPALIVE_INTERVAL_SEC", "30"))
-KEEPALIVE_LATENCY_FILE = os.getenv("MATTER_KEEPALIVE_LATENCY_FILE", "/run/matter-keepalive-latency.json")
+KEEPALIVE_LATENCY_FILE = os.getenv("MATTER_KEEPALIVE_LATENCY_FILE", KEEPALIVE_LATENCY_FILE_DEFAULT)
+KEEPALIVE_HISTOGRAM_FILE = os.getenv(
+    "MATTER_KEEPALIVE_HISTOGRAM_FILE",
+    os.path.join(os.path.dirname(KEEPALIVE_LATENCY_FILE) or ".", "matter-keepalive-histograms.json"),
+)
+# Append-only probe/transition history; empty disables it. The latency file
+# stays the current-state snapshot.
+KEEPALIVE_HISTORY_DIR = os.getenv("MATTER_KEEPALIVE_HISTORY_DIR", "/var/lib/matter-keepalive/history")
+KEEPALIVE_HISTORY_RAW_HOURS = float(os.getenv("MATTER_KEEPALIVE_HISTORY_RAW_HOURS", "24"))
+KEEPALIVE_HISTORY_ROLLUP_DAYS = float(os.getenv("MATTER_KEEPALIVE_HISTORY_ROLLUP_DAYS", "30"))
+KEEPALIVE_HISTORY_COMPACT_SEC = 3600
+# Prometheus /metrics endpoint; port 0 disables it.
+KEEPALIVE_METRICS_HOST = os.getenv("MATTER_KEEPALIVE_METRICS_HOST", "127.0.0.1")
+KEEPALIVE_METRICS_PORT = int(os.getenv("MATTER_KEEPALIVE_METRICS_PORT", "0"))
 KEEPALIVE_READ_TIMEOUT_SEC = float(os.getenv("MATTER_KEEPALIVE_READ_TIMEOUT_SEC", "8"))
 KEEPALIVE_SLOW_LATENCY_MS = float(os.getenv("MATTER_KEEPALIVE_SLOW_LATENCY_MS", "1500"))
+# Per-node adaptive timeout, computed like TCP's RTO (RFC 6298) from a
+# smoothed RTT and its variance. Until a node has RTT_MIN_SAMPLES successful
+# reads, the global READ_TIMEOUT/SLOW_LATENCY values apply.
+KEEPALIVE_RTO_MIN_MS = float(os.getenv("MATTER_KEEPALIVE_RTO_MIN_MS", "400"))
+KEEPALIVE_RTO_GRANULARITY_MS = float(os.getenv("MATTER_KEEPALIVE_RTO_GRANULARITY_MS", "50"))
+KEEPALIVE_RTT_MIN_SAMPLES = int(os.getenv("MATTER_KEEPALIVE_RTT_MIN_SAMPLES", "3"))
+KEEPALIVE_ADAPTIVE_SLOW_MIN_MS = float(os.getenv("MATTER_KEEPALIVE_ADAPTIVE_SLOW_MIN_MS", "250"))
 KEEPALIVE_FAILURE_PENALTY = int(os.getenv("MATTER_KEEPALIVE_FAILURE_PENALTY", "2"))
 KEEPALIVE_SLOW_PENALTY = int(os.getenv("MATTER_KEEPALIVE_SLOW_PENALTY", "1"))
 KEEPALIVE_SUCCESS_DECAY = int(os.getenv("MATTER_KEEPALIVE_SUCCESS_DECAY", "1"))
@@ -21,6 +51,14 @@ KEEPALIVE_PERSISTENT_SCORE = int(os.getenv("MATTER_KEEPALIVE_PERSISTENT_SCORE",
 KEEPALIVE_DEGRADED_FAILURES = int(os.getenv("MATTER_KEEPALIVE_DEGRADED_FAILURES", "2"))
 KEEPALIVE_PERSISTENT_FAILURES = int(os.getenv("MATTER_KEEPALIVE_PERSISTENT_FAILURES", "3"))
 KEEPALIVE_DEGRADED_SLOW_STREAK = int(os.getenv("MATTER_KEEPALIVE_DEGRADED_SLOW_STREAK", "3"))
+# When set (p50/p90/p99), judge latency health on that percentile over
+# HEALTH_PERCENTILE_WINDOW instead of the consecutive slow-read streak. It
+# trips when the percentile exceeds both the global slow threshold and
+# TAIL_RATIO x the node's own 24h median.
+KEEPALIVE_HEALTH_PERCENTILE = os.getenv("MATTER_KEEPALIVE_HEALTH_PERCENTILE", "").strip().lower()
+KEEPALIVE_HEALTH_PERCENTILE_WINDOW = os.getenv("MATTER_KEEPALIVE_HEALTH_PERCENTILE_WINDOW", "1h").strip()
+KEEPALIVE_HEALTH_TAIL_RATIO = float(os.getenv("MATTER_KEEPALIVE_HEALTH_TAIL_RATIO", "3"))
+KEEPALIVE_HEALTH_MIN_SAMPLES = int(os.getenv("MATTER_KEEPALIVE_HEALTH_MIN_SAMPLES", "10"))
 KEEPALIVE_STALE_WARN_SEC = float(
     os.getenv("MATTER_KEEPALIVE_STALE_WARN_SEC", str(max(120, KEEPALIVE_INTERVAL_SEC * 4)))
 )
@@ -29,23 +67,31 @@ KEEPALIVE_STALE_CRIT_SEC = float(
 )
 KEEPALIVE_NODE_BACKOFF_BASE_SEC = float(os.getenv("MATTER_KEEPALIVE_NODE_BACKOFF_BASE_SEC", "60"))
 KEEPALIVE_NODE_BACKOFF_MAX_SEC = float(os.getenv("MATTER_KEEPALIVE_NODE_BACKOFF_MAX_SEC", "900"))
+# Per-node probe cadence: stable nodes back off, degraded nodes are watched
+# more closely, failures follow _failure_backoff_sec.
+KEEPALIVE_STABLE_INTERVAL_SEC = float(
+    os.getenv("MATTER_KEEPALIVE_STABLE_INTERVAL_SEC", str(KEEPALIVE_INTERVAL_SEC * 2))
+)
+KEEPALIVE_STABLE_AFTER_ACKS = int(os.getenv("MATTER_KEEPALIVE_STABLE_AFTER_ACKS", "10"))
+KEEPALIVE_DEGRADED_INTERVAL_SEC = float(
+    os.getenv("MATTER_KEEPALIVE_DEGRADED_INTERVAL_SEC", str(max(5, KEEPALIVE_INTERVAL_SEC // 2)))
+)
+KEEPALIVE_SCHEDULE_JITTER = float(os.getenv("MATTER_KEEPALIVE_SCHEDULE_JITTER", "0.1"))
+# Thread airtime budget for keepalive reads (token bucket); 0 disables it.
+# Normal-priority probes may not dip into the last PRIORITY_RESERVE tokens,
+# which stay available for forced and degraded nodes.
+KEEPALIVE_READS_PER_SEC = float(os.getenv("MATTER_KEEPALIVE_READS_PER_SEC", "0"))
+KEEPALIVE_READ_BURST = max(1.0, float(os.getenv("MATTER_KEEPALIVE_READ_BURST", "4")))
+KEEPALIVE_PRIORITY_RESERVE = max(0.0, float(os.getenv("MATTER_KEEPALIVE_PRIORITY_RESERVE", "1")))
+# Hedged reads for forced nodes: when the primary path has not answered within
+# the node's usual latency, also read the next candidate path and take the
+# first answer.
+KEEPALIVE_HEDGE_FORCED = os.getenv("MATTER_KEEPALIVE_HEDGE_FORCED", "0").lower() not in {"0", "false", "no"}
+KEEPALIVE_HEDGE_MIN_DELAY_MS = float(os.getenv("MATTER_KEEPALIVE_HEDGE_MIN_DELAY_MS", "150"))
 KEEPALIVE_MAX_ATTRIBUTES_PER_PASS = max(1, int(os.getenv("MATTER_KEEPALIVE_MAX_ATTRIBUTES_PER_PASS", "1")))
-KEEPALIVE_SKIP_SLEEPY = os.getenv("MATTER_KEEPALIVE_SKIP_SLEEPY", "1").lower() not in {"0", "false", "no"}
-KEEPALIVE_FORCE_NODE_IDS = {
-    int(value)
-    for value in os.getenv("MATTER_KEEPALIVE_FORCE_NODE_IDS", "").replace(",", " ").split()
-    if value.isdigit()
-}
-KEEPALIVE_FORCE_LABELS = {
-    value.strip().lower()
-    for value in os.getenv("MATTER_KEEPALIVE_FORCE_LABELS", "").split(",")
-    if value.strip()
-}
-KEEPALIVE_FORCE_PRODUCT_KEYWORDS = {
-    value.strip().lower()
-    for value in os.getenv("MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS", "").split(",")
-    if value.strip()
-}
+# 1/1 keeps the original one-node-at-a-time sweep.
+KEEPALIVE_MAX_INFLIGHT = max(1, int(os.getenv("MATTER_KEEPALIVE_MAX_INFLIGHT", "1")))
+KEEPALIVE_MAX_INFLIGHT_PER_ROUTER = max(1, int(os.getenv("MATTER_KEEPALIVE_MAX_INFLIGHT_PER_ROUTER", "1")))
 KEEPALIVE_ATTRIBUTE_PATHS = [
     value.strip()
     for value in os.getenv("MATTER_KEEPALIVE_ATTRIBUTE_PATHS", "0/40/5").split(",")
@@ -59,20 +105,7 @@ KEEPALIVE_FORCE_ATTRIBUTE_PATHS = [
     ).split(",")
     if value.strip()
 ]
-THREAD_VENDOR_KEYWORDS = (
-    "inovelli",
-    "meross",
-    "ikea of sweden",
-    "smartwings",
-    "aqara",
-    "nanoleaf",
-)
-SLEEPY_PRODUCT_KEYWORDS = (
-    "button",
-    "door/window",
-    "presence",
-    "remote",
-)
+NODE_ROOMS, NODE_ROOMS_BY_LABEL = load_rooms_from_env()
 
 
 def _b64_to_bytes(value: str) -> bytes | None:
@@ -82,56 +115,70 @@ def _b64_to_bytes(value: str) -> bytes | None:
         return None
 
 
-def _is_forced_keepalive_node(node_id: int, attrs: dict) -> bool:
-    if node_id in KEEPALIVE_FORCE_NODE_IDS:
-        return True
-    label = _node_label(attrs).strip().lower()
-    if label and label in KEEPALIVE_FORCE_LABELS:
-        return True
-    product = str(attrs.get("0/40/3") or "").strip().lower()
-    return bool(product and any(keyword in product for keyword in KEEPALIVE_FORCE_PRODUCT_KEYWORDS))
+_metrics_writer = SnapshotDeltaWriter(KEEPALIVE_LATENCY_FILE)
+_histograms_writer = SnapshotDeltaWriter(KEEPALIVE_HISTOGRAM_FILE)
 
 
-def _is_thread_candidate(node_id: int, attrs: dict) -> bool:
-    vendor = str(attrs.get("0/40/1") or "").strip().lower()
-    product = str(attrs.get("0/40/3") or "").strip().lower()
-    if _is_forced_keepalive_node(node_id, attrs):
-        return True
-    if KEEPALIVE_SKIP_SLEEPY and any(keyword in product for keyword in SLEEPY_PRODUCT_KEYWORDS):
-        return False
-    if any(keyword in vendor for keyword in THREAD_VENDOR_KEYWORDS):
-        return True
-    for path in attrs.keys():
-        if isinstance(path, str) and (path.startswith("0/53/") or path.startswith("0/54/")):
-            return True
-    if "button" in product or "remote" in product:
-        return True
-    return False
+def _write_keepalive_metrics(metrics: dict[str, dict], window_stats: dict | None = None) -> None:
+    top: dict = {"updated_at_epoch": time.time()}
+    if window_stats:
+        top["window"] = window_stats
+    _metrics_writer.write(metrics, top)
 
 
-def _write_keepalive_metrics(metrics: dict[str, dict]) -> None:
-    parent = os.path.dirname(KEEPALIVE_LATENCY_FILE) or "."
-    os.makedirs(parent, exist_ok=True)
-    tmp = f"{KEEPALIVE_LATENCY_FILE}.tmp"
-    payload = {
-        "updated_at_epoch": time.time(),
-        "nodes": metrics,
-    }
-    with open(tmp, "w", encoding="utf-8") as handle:
-        json.dump(payload, handle, separators=(",", ":"), sort_keys=True)
-    os.replace(tmp, KEEPALIVE_LATENCY_FILE)
+def _write_keepalive_histograms(histograms: dict[str, dict]) -> None:
+    _histograms_writer.write(histograms, {"updated_at_epoch": time.time(), "sub_buckets": latency_histogram.SUB_BUCKETS})
 
 
-def _load_keepalive_metrics() -> dict[str, dict]:
-    try:
-        with open(KEEPALIVE_LATENCY_FILE, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-    except Exception:
+def _load_keepalive_histograms() -> dict[str, dict]:
+    histograms = KeepaliveMetricsFile(KEEPALIVE_HISTOGRAM_FILE)
+    nodes = histograms.load()
+    # Bucket indexes are only meaningful for the layout they were written with.
+    if histograms.data.get("sub_buckets") != latency_histogram.SUB_BUCKETS:
         return {}
-    if not isinstance(data, dict):
-        return {}
-    nodes = data.get("nodes")
-    return nodes if isinstance(nodes, dict) else {}
+    return nodes
+
+
+def _history_store() -> HistoryStore | None:
+    if not KEEPALIVE_HISTORY_DIR:
+        return None
+    return HistoryStore(
+        KEEPALIVE_HISTORY_DIR,
+        raw_retention_sec=KEEPALIVE_HISTORY_RAW_HOURS * 3600,
+        rollup_retention_sec=KEEPALIVE_HISTORY_ROLLUP_DAYS * 86400,
+    )
+
+
+def _history_records(node_id: int, entry: dict, previous_entry: dict, now_epoch: float) -> list[dict]:
+    records = []
+    state = str(entry.get("health_state") or "healthy")
+    previous_state = str(previous_entry.get("health_state") or "healthy")
+    if not entry.get("skipped"):
+        record = {
+            "t": round(now_epoch, 3),
+            "node": node_id,
+            "kind": "probe",
+            "ok": bool(entry.get("ok")),
+            "src": entry.get("ack_source") or "read",
+            "state": state,
+        }
+        if record["src"] == "read" and isinstance(entry.get("latency_ms"), (int, float)):
+            record["ms"] = round(float(entry["latency_ms"]), 1)
+        if entry.get("error"):
+            record["error"] = str(entry["error"])
+        records.append(record)
+    if state != previous_state:
+        records.append(
+            {
+                "t": round(now_epoch, 3),
+                "node": node_id,
+                "kind": "state",
+                "from": previous_state,
+                "to": state,
+                "reason": entry.get("health_reason") or "",
+            }
+        )
+    return records
 
 
 def _entry_number(entry: dict, key: str, default: float = 0.0) -> float:
@@ -148,6 +195,22 @@ def _node_label(attrs: dict) -> str:
     return "(unlabeled)"
 
 
+def _latency_tail_reason(entry: dict) -> str:
+    percentiles = entry.get("latency_percentiles")
+    if not isinstance(percentiles, dict):
+        return ""
+    window = percentiles.get(KEEPALIVE_HEALTH_PERCENTILE_WINDOW) or {}
+    if int(_entry_number(window, "count", 0)) < KEEPALIVE_HEALTH_MIN_SAMPLES:
+        return ""
+    value = window.get(KEEPALIVE_HEALTH_PERCENTILE)
+    if not isinstance(value, (int, float)):
+        return ""
+    baseline = _entry_number(percentiles.get("24h") or {}, "p50", 0.0)
+    if value >= max(KEEPALIVE_SLOW_LATENCY_MS, KEEPALIVE_HEALTH_TAIL_RATIO * baseline):
+        return f"{KEEPALIVE_HEALTH_PERCENTILE} {KEEPALIVE_HEALTH_PERCENTILE_WINDOW} {int(round(value))}ms"
+    return ""
+
+
 def _health_state(entry: dict, now_epoch: float) -> tuple[str, str]:
     score = int(_entry_number(entry, "degraded_score", 0))
     consecutive_failures = int(_entry_number(entry, "consecutive_failures", 0))
@@ -168,7 +231,11 @@ def _health_state(entry: dict, now_epoch: float) -> tuple[str, str]:
         return "degraded", f"{consecutive_failures} failed reads"
     if ack_age_sec is not None and ack_age_sec >= KEEPALIVE_STALE_WARN_SEC:
         return "degraded", f"stale ack {int(round(ack_age_sec))}s"
-    if consecutive_slow >= KEEPALIVE_DEGRADED_SLOW_STREAK:
+    if KEEPALIVE_HEALTH_PERCENTILE:
+        tail_reason = _latency_tail_reason(entry)
+        if tail_reason:
+            return "degraded", tail_reason
+    elif consecutive_slow >= KEEPALIVE_DEGRADED_SLOW_STREAK:
         return "degraded", f"{consecutive_slow} slow reads"
     if score >= KEEPALIVE_DEGRADED_SCORE:
         return "degraded", f"score {score}"
@@ -176,21 +243,10 @@ def _health_state(entry: dict, now_epoch: float) -> tuple[str, str]:
     return "healthy", ""
 
 
-async def _call(ws, message_id: str, command: str, args: dict | None = None) -> dict:
-    payload = {"message_id": message_id, "command": command, "args": args or {}}
-    await ws.send(json.dumps(payload))
-    while True:
-        message = json.loads(await ws.recv())
-        if message.get("event"):
-            continue
-        if message.get("message_id") == message_id:
-            return message
-
-
 def _keepalive_attribute_paths(node_id: int, attrs: dict) -> list[str]:
     paths = (
         KEEPALIVE_FORCE_ATTRIBUTE_PATHS
-        if _is_forced_keepalive_node(node_id, attrs)
+        if is_forced_node(node_id, attrs)
         else KEEPALIVE_ATTRIBUTE_PATHS
     )
     # Prefer paths that the cached interview says exist, but leave BasicInformation
@@ -217,160 +273,729 @@ def _failure_backoff_sec(consecutive_failures: int) -> float:
     return min(KEEPALIVE_NODE_BACKOFF_MAX_SEC, backoff)
 
 
-async def _read_keepalive_attribute(ws, node_id: int, attribute_path: str) -> dict:
-    return await asyncio.wait_for(
-        _call(
-            ws,
-            f"keepalive:{node_id}:{attribute_path}",
-            "read_attribute",
-            {
-                "node_id": node_id,
-                "attribute_path": attribute_path,
-            },
-        ),
-        timeout=KEEPALIVE_READ_TIMEOUT_SEC,
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _clamp(self, cost: float, reserve: float) -> tuple[float, float]:
+        # A request larger than the bucket could never be granted; a full
+        # bucket always admits it, so a node with many paths (or a reserve
+        # close to the burst) is delayed rather than deferred forever.
+        cost = min(cost, self.burst)
+        return cost, min(reserve, self.burst - cost)
+
+    def try_take(self, cost: float, reserve: float = 0.0) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        cost, reserve = self._clamp(cost, reserve)
+        if self.tokens - cost < reserve:
+            return False
+        self.tokens -= cost
+        return True
+
+    def wait_sec(self, cost: float, reserve: float = 0.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        cost, reserve = self._clamp(cost, reserve)
+        return max(0.0, (cost + reserve - self.tokens) / self.rate)
+
+
+PRIORITY_FORCED = 0
+PRIORITY_DEGRADED = 1
+PRIORITY_NORMAL = 2
+PRIORITY_NAMES = {PRIORITY_FORCED: "forced", PRIORITY_DEGRADED: "degraded", PRIORITY_NORMAL: "normal"}
+
+
+def _probe_priority(node_id: int, attrs: dict, entry: dict) -> int:
+    if is_forced_node(node_id, attrs):
+        return PRIORITY_FORCED
+    if entry.get("health_state") in {"degraded", "persistent"} or _entry_number(entry, "consecutive_failures", 0) > 0:
+        return PRIORITY_DEGRADED
+    return PRIORITY_NORMAL
+
+
+def _probe_interval_sec(entry: dict) -> float:
+    consecutive_failures = int(_entry_number(entry, "consecutive_failures", 0))
+    if consecutive_failures > 0:
+        return _failure_backoff_sec(consecutive_failures)
+    if entry.get("health_state") in {"degraded", "persistent"}:
+        return KEEPALIVE_DEGRADED_INTERVAL_SEC
+    if int(_entry_number(entry, "consecutive_ok", 0)) >= KEEPALIVE_STABLE_AFTER_ACKS:
+        return KEEPALIVE_STABLE_INTERVAL_SEC
+    return float(KEEPALIVE_INTERVAL_SEC)
+
+
+def _has_fresh_report(previous_entry: dict, reported_epoch: float | None, now_epoch: float) -> bool:
+    # Fresh relative to the node's own cadence (stable, degraded or backoff),
+    # not the global interval.
+    return (
+        reported_epoch is not None
+        and now_epoch - reported_epoch < _probe_interval_sec(previous_entry) * (1.0 + KEEPALIVE_SCHEDULE_JITTER)
+        and reported_epoch > _entry_number(previous_entry, "last_ack_epoch", 0.0)
     )
 
 
-async def _discover_keepalive_nodes(ws) -> list[tuple[int, dict, bool]]:
-    start = await _call(ws, "keepalive:start", "start_listening")
-    if "error_code" in start:
-        details = start.get("details") or "unknown error"
-        raise RuntimeError(f"start_listening failed: {details}")
+def _next_probe_delay_sec(entry: dict) -> float:
+    # Jitter keeps nodes that were scheduled together from re-aligning.
+    return _probe_interval_sec(entry) * (1.0 + random.uniform(-KEEPALIVE_SCHEDULE_JITTER, KEEPALIVE_SCHEDULE_JITTER))
 
-    found: list[tuple[int, dict, bool]] = []
-    for node in start.get("result") or []:
+
+HEDGE_ENTRY_KEYS = ("hedge_probes", "hedges", "hedge_wins", "hedge_rate", "hedge_win_rate")
+RTT_ENTRY_KEYS = ("srtt_ms", "rttvar_ms", "rto_ms", "rtt_samples", "slow_threshold_ms")
+
+
+def _rtt_update(entry: dict, sample_ms: float) -> None:
+    samples = int(_entry_number(entry, "rtt_samples", 0))
+    if samples <= 0 or "srtt_ms" not in entry:
+        srtt = sample_ms
+        rttvar = sample_ms / 2.0
+    else:
+        srtt = _entry_number(entry, "srtt_ms")
+        rttvar = _entry_number(entry, "rttvar_ms")
+        rttvar = 0.75 * rttvar + 0.25 * abs(srtt - sample_ms)
+        srtt = 0.875 * srtt + 0.125 * sample_ms
+    rto = srtt + max(KEEPALIVE_RTO_GRANULARITY_MS, 4.0 * rttvar)
+    rto = min(KEEPALIVE_READ_TIMEOUT_SEC * 1000.0, max(KEEPALIVE_RTO_MIN_MS, rto))
+    entry["srtt_ms"] = srtt
+    entry["rttvar_ms"] = rttvar
+    entry["rto_ms"] = rto
+    entry["rtt_samples"] = samples + 1
+    # "Slow" is relative to the node's own history, kept below its timeout so
+    # a slow read is still distinguishable from a lost one.
+    entry["slow_threshold_ms"] = min(rto, max(KEEPALIVE_ADAPTIVE_SLOW_MIN_MS, 2.0 * srtt, srtt + 2.0 * rttvar))
+
+
+def _rto_backoff(entry: dict) -> None:
+    # Karn: a timed-out read gives no RTT sample; double the timeout instead.
+    if "rto_ms" in entry:
+        entry["rto_ms"] = min(KEEPALIVE_READ_TIMEOUT_SEC * 1000.0, _entry_number(entry, "rto_ms") * 2.0)
+
+
+def _node_read_timeout_sec(entry: dict) -> float:
+    if int(_entry_number(entry, "rtt_samples", 0)) < KEEPALIVE_RTT_MIN_SAMPLES or "rto_ms" not in entry:
+        return KEEPALIVE_READ_TIMEOUT_SEC
+    return _entry_number(entry, "rto_ms") / 1000.0
+
+
+def _node_slow_threshold_ms(entry: dict) -> float:
+    if int(_entry_number(entry, "rtt_samples", 0)) < KEEPALIVE_RTT_MIN_SAMPLES or "slow_threshold_ms" not in entry:
+        return KEEPALIVE_SLOW_LATENCY_MS
+    return _entry_number(entry, "slow_threshold_ms")
+
+
+async def _read_keepalive_attribute(
+    client: MatterClient,
+    node_id: int,
+    attribute_path: str,
+    timeout_sec: float = KEEPALIVE_READ_TIMEOUT_SEC,
+) -> dict:
+    return await client.call(
+        "read_attribute",
+        {
+            "node_id": node_id,
+            "attribute_path": attribute_path,
+        },
+        timeout=timeout_sec,
+        message_id=f"keepalive:{node_id}:{attribute_path}",
+    )
+
+
+async def _timed_keepalive_read(
+    client: MatterClient,
+    node_id: int,
+    attribute_path: str,
+    timeout_sec: float,
+) -> tuple[dict, float]:
+    started = time.monotonic()
+    try:
+        response = await _read_keepalive_attribute(client, node_id, attribute_path, timeout_sec)
+    except TimeoutError:
+        response = {
+            "error_code": "timeout",
+            "details": f"{attribute_path} read timed out after {timeout_sec:g}s",
+        }
+    return response, (time.monotonic() - started) * 1000.0
+
+
+def _hedge_delay_sec(entry: dict) -> float:
+    # "Usual" latency: the smoothed RTT plus two deviations, so a healthy node
+    # answers before the hedge fires almost every time.
+    if int(_entry_number(entry, "rtt_samples", 0)) < KEEPALIVE_RTT_MIN_SAMPLES:
+        usual_ms = KEEPALIVE_SLOW_LATENCY_MS
+    else:
+        usual_ms = _entry_number(entry, "srtt_ms") + 2.0 * _entry_number(entry, "rttvar_ms")
+    return max(KEEPALIVE_HEDGE_MIN_DELAY_MS, usual_ms) / 1000.0
+
+
+async def _hedged_keepalive_read(
+    client: MatterClient,
+    node_id: int,
+    primary_path: str,
+    hedge_path: str,
+    timeout_sec: float,
+    hedge_delay_sec: float,
+    may_hedge,
+) -> tuple[dict, float, str, bool]:
+    """Returns (response, latency_ms since the primary read, answering path, whether a hedge was sent)."""
+    started = time.monotonic()
+    primary = asyncio.create_task(_timed_keepalive_read(client, node_id, primary_path, timeout_sec))
+    tasks = {primary: primary_path}
+    hedge_offset_ms = 0.0
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=min(hedge_delay_sec, timeout_sec))
+        hedged = False
+        if not done and may_hedge():
+            hedged = True
+            hedge_offset_ms = (time.monotonic() - started) * 1000.0
+            remaining = max(0.05, timeout_sec - hedge_delay_sec)
+            tasks[asyncio.create_task(_timed_keepalive_read(client, node_id, hedge_path, remaining))] = hedge_path
+
+        last: tuple[dict, float, str] | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                response, latency_ms = task.result()
+                if task is not primary:
+                    latency_ms += hedge_offset_ms
+                last = (response, latency_ms, tasks[task])
+                if "error_code" not in response:
+                    return response, latency_ms, tasks[task], hedged
+        assert last is not None
+        return last[0], last[1], last[2], hedged
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _load_node_store(client: MatterClient) -> dict[int, dict]:
+    store: dict[int, dict] = {}
+    for node in await start_listening(client):
         node_id = node.get("node_id")
+        if isinstance(node_id, int) and node_id > 0:
+            store[node_id] = node
+    return store
+
+
+def _apply_node_event(store: dict[int, dict], last_report: dict[int, float], message: dict) -> None:
+    event = message.get("event")
+    data = message.get("data")
+    if event in {"node_added", "node_updated"} and isinstance(data, dict):
+        node_id = data.get("node_id")
+        if isinstance(node_id, int) and node_id > 0:
+            store[node_id] = data
+    elif event == "node_removed":
+        node_id = data.get("node_id") if isinstance(data, dict) else data
+        if isinstance(node_id, int):
+            store.pop(node_id, None)
+            last_report.pop(node_id, None)
+    elif event == "attribute_updated" and isinstance(data, (list, tuple)) and len(data) >= 3:
+        node_id, attribute_path, value = data[0], data[1], data[2]
+        if not isinstance(node_id, int):
+            return
+        node = store.get(node_id)
+        if node is not None and isinstance(attribute_path, str):
+            attrs = node.get("attributes")
+            if not isinstance(attrs, dict):
+                attrs = node["attributes"] = {}
+            attrs[attribute_path] = value
+        # A subscription report had to come over the mesh from the node itself,
+        # so it is as good an ack as a read we issued.
+        last_report[node_id] = time.time()
+    elif event == "node_event" and isinstance(data, dict):
+        node_id = data.get("node_id")
+        if isinstance(node_id, int):
+            last_report[node_id] = time.time()
+
+
+def _keepalive_candidates(store: dict[int, dict]) -> list[tuple[int, dict, bool]]:
+    found: list[tuple[int, dict, bool]] = []
+    for node_id, node in store.items():
         attrs = node.get("attributes") or {}
         available = bool(node.get("available", False))
-        if not isinstance(node_id, int) or node_id <= 0:
-            continue
-        if _is_thread_candidate(node_id, attrs):
+        if is_always_on_thread_node(node_id, attrs):
             found.append((node_id, attrs, available))
     return found
 
 
-async def _keepalive_once(ws_url: str) -> None:
-    async with websockets.connect(ws_url, max_size=None) as ws:
-        await ws.recv()
-        nodes = await _discover_keepalive_nodes(ws)
-        previous_metrics = _load_keepalive_metrics()
-        metrics: dict[str, dict] = {}
-        now_epoch = time.time()
-
-        for node_id, attrs, available in sorted(nodes, key=lambda item: item[0]):
-            node_key = str(node_id)
-            previous_entry = previous_metrics.get(node_key)
-            if not isinstance(previous_entry, dict):
-                previous_entry = {}
-
-            previous_last_ack = previous_entry.get("last_ack_epoch")
-            previous_score = int(_entry_number(previous_entry, "degraded_score", 0))
-            previous_failures = int(_entry_number(previous_entry, "consecutive_failures", 0))
-            previous_slow = int(_entry_number(previous_entry, "consecutive_slow", 0))
-            previous_next_probe = previous_entry.get("next_probe_epoch")
-
-            entry = {
-                "label": _node_label(attrs),
-                "vendor": str(attrs.get("0/40/1") or ""),
-                "product": str(attrs.get("0/40/3") or ""),
-                "last_seen_epoch": now_epoch,
-                "reported_available": available,
-            }
-            all_attribute_paths = _keepalive_attribute_paths(node_id, attrs)
-            attribute_paths, next_attribute_index = _rotate_attribute_paths(all_attribute_paths, previous_entry)
-            entry["attribute_paths"] = attribute_paths
-            entry["candidate_attribute_paths"] = all_attribute_paths
-            entry["next_attribute_index"] = next_attribute_index
-
-            if isinstance(previous_last_ack, (int, float)):
-                entry["last_ack_epoch"] = float(previous_last_ack)
-
-            if isinstance(previous_next_probe, (int, float)) and now_epoch < float(previous_next_probe):
-                entry["ok"] = bool(previous_entry.get("ok", False))
-                entry["skipped"] = True
-                entry["skip_reason"] = f"backoff until {int(round(float(previous_next_probe) - now_epoch))}s"
-                entry["consecutive_failures"] = previous_failures
-                entry["consecutive_slow"] = previous_slow
-                entry["degraded_score"] = previous_score
-                entry["next_probe_epoch"] = float(previous_next_probe)
-                state, reason = _health_state(entry, now_epoch)
-                entry["health_state"] = state
-                if reason:
-                    entry["health_reason"] = reason
-                metrics[node_key] = entry
-                continue
-
-            started = time.monotonic()
-            responses = []
-            for attribute_path in attribute_paths:
-                try:
-                    response = await _read_keepalive_attribute(ws, node_id, attribute_path)
-                except TimeoutError:
-                    response = {
-                        "error_code": "timeout",
-                        "details": f"{attribute_path} read timed out after {KEEPALIVE_READ_TIMEOUT_SEC:g}s",
-                    }
-                responses.append(response)
-            response = next((item for item in responses if "error_code" not in item), responses[-1])
-            latency_ms = (time.monotonic() - started) * 1000.0
-            entry["latency_ms"] = latency_ms
-            if "error_code" in response:
-                details = response.get("details") or "unknown error"
-                consecutive_failures = previous_failures + 1
-                entry["ok"] = False
-                entry["error"] = details
-                entry["consecutive_failures"] = consecutive_failures
-                entry["consecutive_slow"] = 0
-                entry["degraded_score"] = previous_score + KEEPALIVE_FAILURE_PENALTY
-                entry["next_probe_epoch"] = now_epoch + _failure_backoff_sec(consecutive_failures)
-                metrics[node_key] = entry
-                print(f"keepalive node_id={node_id} failed: {details}", file=sys.stderr, flush=True)
-            else:
-                slow = latency_ms >= KEEPALIVE_SLOW_LATENCY_MS
-                entry["ok"] = True
-                entry["last_ack_epoch"] = now_epoch
-                entry["consecutive_failures"] = 0
-                entry["consecutive_slow"] = (previous_slow + 1) if slow else 0
-                entry.pop("next_probe_epoch", None)
-                if slow:
-                    entry["degraded_score"] = previous_score + KEEPALIVE_SLOW_PENALTY
-                else:
-                    entry["degraded_score"] = max(0, previous_score - KEEPALIVE_SUCCESS_DECAY)
-                metrics[node_key] = entry
-
-            state, reason = _health_state(entry, now_epoch)
-            previous_state = str(previous_entry.get("health_state") or "healthy")
-            entry["health_state"] = state
-            if reason:
-                entry["health_reason"] = reason
-            else:
-                entry.pop("health_reason", None)
-
-            previous_since = previous_entry.get("degraded_since_epoch")
-            if state == "healthy":
-                entry.pop("degraded_since_epoch", None)
-            elif isinstance(previous_since, (int, float)) and previous_state in {"degraded", "persistent"}:
-                entry["degraded_since_epoch"] = float(previous_since)
-            else:
-                entry["degraded_since_epoch"] = now_epoch
-
-            previous_reason = str(previous_entry.get("health_reason") or "")
-            if state != previous_state:
-                suffix = f" ({reason})" if reason else ""
-                print(
-                    f"keepalive node_id={node_id} label={entry['label']!r} state {previous_state} -> {state}{suffix}",
-                    file=sys.stderr,
-                    flush=True,
+def _thread_router_key(node_id: int, attrs: dict) -> str:
+    # End devices talk through exactly one parent router (their only neighbor
+    # entry, RLOC16 field "2"); group them by that router's id so one busy
+    # parent/border router path is not flooded. Routers and nodes without
+    # diagnostics share a per-network bucket.
+    role = attrs.get("0/53/1")
+    neighbors = attrs.get("0/53/7")
+    if role in (2, 3) and isinstance(neighbors, list) and len(neighbors) == 1:
+        entry = neighbors[0]
+        rloc16 = entry.get("2") if isinstance(entry, dict) else None
+        if isinstance(rloc16, int):
+            return f"router:{rloc16 >> 10}"
+    ext_pan_id = attrs.get("0/53/4")
+    if isinstance(ext_pan_id, (int, str)) and ext_pan_id != "":
+        return f"network:{ext_pan_id}"
+    return "default"
+
+
+async def _probe_keepalive_node(
+    client: MatterClient,
+    node_id: int,
+    attrs: dict,
+    available: bool,
+    previous_entry: dict,
+    now_epoch: float,
+    reported_epoch: float | None,
+    slots: asyncio.Semaphore,
+    router_slots: asyncio.Semaphore,
+    may_hedge=lambda: True,
+    histogram: dict | None = None,
+) -> dict:
+    previous_last_ack = previous_entry.get("last_ack_epoch")
+    previous_score = int(_entry_number(previous_entry, "degraded_score", 0))
+    previous_failures = int(_entry_number(previous_entry, "consecutive_failures", 0))
+    previous_slow = int(_entry_number(previous_entry, "consecutive_slow", 0))
+    previous_ok = int(_entry_number(previous_entry, "consecutive_ok", 0))
+    previous_next_probe = previous_entry.get("next_probe_epoch")
+
+    entry = {
+        "label": _node_label(attrs),
+        "vendor": str(attrs.get("0/40/1") or ""),
+        "product": str(attrs.get("0/40/3") or ""),
+        "room": room_for_attrs(attrs, NODE_ROOMS, NODE_ROOMS_BY_LABEL),
+        "last_seen_epoch": now_epoch,
+        "reported_available": available,
+        "router_key": _thread_router_key(node_id, attrs),
+    }
+    for key in ("deferred_count", "last_deferred_epoch", *RTT_ENTRY_KEYS, *HEDGE_ENTRY_KEYS):
+        if key in previous_entry:
+            entry[key] = previous_entry[key]
+    if histogram is not None:
+        entry["latency_percentiles"] = latency_histogram.summarize_all(histogram, now_epoch)
+    all_attribute_paths = _keepalive_attribute_paths(node_id, attrs)
+    attribute_paths, next_attribute_index = _rotate_attribute_paths(all_attribute_paths, previous_entry)
+    entry["attribute_paths"] = attribute_paths
+    entry["candidate_attribute_paths"] = all_attribute_paths
+    entry["next_attribute_index"] = next_attribute_index
+
+    if isinstance(previous_last_ack, (int, float)):
+        entry["last_ack_epoch"] = float(previous_last_ack)
+
+    if _has_fresh_report(previous_entry, reported_epoch, now_epoch):
+        # The node reported on its own since the last ack; no read needed,
+        # and it ends any failure backoff.
+        entry["ok"] = True
+        entry["ack_source"] = "event"
+        entry["last_ack_epoch"] = reported_epoch
+        entry["consecutive_failures"] = 0
+        entry["consecutive_slow"] = previous_slow
+        entry["consecutive_ok"] = previous_ok + 1
+        entry["degraded_score"] = max(0, previous_score - KEEPALIVE_SUCCESS_DECAY)
+        if isinstance(previous_entry.get("latency_ms"), (int, float)):
+            entry["latency_ms"] = float(previous_entry["latency_ms"])
+        return _finish_keepalive_entry(node_id, entry, previous_entry, now_epoch)
+
+    if isinstance(previous_next_probe, (int, float)) and now_epoch < float(previous_next_probe):
+        entry["ok"] = bool(previous_entry.get("ok", False))
+        entry["skipped"] = True
+        entry["skip_reason"] = f"backoff until {int(round(float(previous_next_probe) - now_epoch))}s"
+        entry["consecutive_failures"] = previous_failures
+        entry["consecutive_slow"] = previous_slow
+        entry["consecutive_ok"] = previous_ok
+        entry["degraded_score"] = previous_score
+        entry["next_probe_epoch"] = float(previous_next_probe)
+        state, reason = _health_state(entry, now_epoch)
+        entry["health_state"] = state
+        if reason:
+            entry["health_reason"] = reason
+        return entry
+
+    # Take the per-router slot first so a node queued behind a busy router
+    # does not sit on a global slot that another router could use.
+    timeout_sec = _node_read_timeout_sec(entry)
+    slow_threshold_ms = _node_slow_threshold_ms(entry)
+    hedge = KEEPALIVE_HEDGE_FORCED and len(all_attribute_paths) > 1 and is_forced_node(node_id, attrs)
+    async with router_slots, slots:
+        started = time.monotonic()
+        responses = []
+        if hedge:
+            primary_path = attribute_paths[0]
+            hedge_path = all_attribute_paths[(all_attribute_paths.index(primary_path) + 1) % len(all_attribute_paths)]
+            response, read_ms, answered_path, hedged = await _hedged_keepalive_read(
+                client,
+                node_id,
+                primary_path,
+                hedge_path,
+                timeout_sec,
+                _hedge_delay_sec(entry),
+                may_hedge,
+            )
+            hedge_probes = int(_entry_number(entry, "hedge_probes", 0)) + 1
+            hedges = int(_entry_number(entry, "hedges", 0)) + (1 if hedged else 0)
+            hedge_wins = int(_entry_number(entry, "hedge_wins", 0))
+            if hedged and answered_path == hedge_path and "error_code" not in response:
+                hedge_wins += 1
+            entry["hedge_probes"] = hedge_probes
+            entry["hedges"] = hedges
+            entry["hedge_wins"] = hedge_wins
+            entry["hedge_rate"] = hedges / hedge_probes
+            entry["hedge_win_rate"] = (hedge_wins / hedges) if hedges else 0.0
+            entry["attribute_paths"] = [primary_path, hedge_path] if hedged else [primary_path]
+            entry["answered_attribute_path"] = answered_path
+            if response.get("error_code") == "timeout":
+                _rto_backoff(entry)
+            elif "error_code" not in response and answered_path == primary_path:
+                # Karn's rule: a hedge win is ambiguous, so it does not feed SRTT.
+                _rtt_update(entry, read_ms)
+            responses.append(response)
+        for attribute_path in ([] if hedge else attribute_paths):
+            response, read_ms = await _timed_keepalive_read(client, node_id, attribute_path, timeout_sec)
+            if response.get("error_code") == "timeout":
+                _rto_backoff(entry)
+            elif "error_code" not in response:
+                _rtt_update(entry, read_ms)
+            responses.append(response)
+        latency_ms = (time.monotonic() - started) * 1000.0
+
+    response = next((item for item in responses if "error_code" not in item), responses[-1])
+    entry["latency_ms"] = latency_ms
+    entry["read_timeout_ms"] = timeout_sec * 1000.0
+    if "error_code" in response:
+        details = response.get("details") or "unknown error"
+        consecutive_failures = previous_failures + 1
+        entry["ok"] = False
+        entry["error"] = details
+        entry["consecutive_failures"] = consecutive_failures
+        entry["consecutive_slow"] = 0
+        entry["consecutive_ok"] = 0
+        entry["degraded_score"] = previous_score + KEEPALIVE_FAILURE_PENALTY
+        entry["next_probe_epoch"] = now_epoch + _failure_backoff_sec(consecutive_failures)
+        print(f"keepalive node_id={node_id} failed: {details}", file=sys.stderr, flush=True)
+    else:
+        slow = latency_ms >= slow_threshold_ms
+        entry["ok"] = True
+        entry["ack_source"] = "read"
+        entry["last_ack_epoch"] = now_epoch
+        entry["consecutive_failures"] = 0
+        entry["consecutive_slow"] = (previous_slow + 1) if slow else 0
+        entry["consecutive_ok"] = previous_ok + 1
+        entry.pop("next_probe_epoch", None)
+        if histogram is not None:
+            latency_histogram.record(histogram, latency_ms, now_epoch)
+            entry["latency_percentiles"] = latency_histogram.summarize_all(histogram, now_epoch)
+        if slow:
+            entry["degraded_score"] = previous_score + KEEPALIVE_SLOW_PENALTY
+        else:
+            entry["degraded_score"] = max(0, previous_score - KEEPALIVE_SUCCESS_DECAY)
+    return _finish_keepalive_entry(node_id, entry, previous_entry, now_epoch)
+
+
+def _finish_keepalive_entry(node_id: int, entry: dict, previous_entry: dict, now_epoch: float) -> dict:
+    state, reason = _health_state(entry, now_epoch)
+    previous_state = str(previous_entry.get("health_state") or "healthy")
+    entry["health_state"] = state
+    if reason:
+        entry["health_reason"] = reason
+    else:
+        entry.pop("health_reason", None)
+
+    previous_since = previous_entry.get("degraded_since_epoch")
+    if state == "healthy":
+        entry.pop("degraded_since_epoch", None)
+    elif isinstance(previous_since, (int, float)) and previous_state in {"degraded", "persistent"}:
+        entry["degraded_since_epoch"] = float(previous_since)
+    else:
+        entry["degraded_since_epoch"] = now_epoch
+
+    previous_reason = str(previous_entry.get("health_reason") or "")
+    if state != previous_state:
+        suffix = f" ({reason})" if reason else ""
+        print(
+            f"keepalive node_id={node_id} label={entry['label']!r} state {previous_state} -> {state}{suffix}",
+            file=sys.stderr,
+            flush=True,
+        )
+    elif state != "healthy" and reason and reason != previous_reason:
+        print(
+            f"keepalive node_id={node_id} label={entry['label']!r} state {state}: {reason}",
+            file=sys.stderr,
+            flush=True,
+        )
+    return entry
+
+
+def _new_window_stats() -> dict:
+    return {
+        "started_monotonic": time.monotonic(),
+        "probes": 0,
+        "event_acked": 0,
+        "skipped": 0,
+        "sum_latency_ms": 0.0,
+        "peak_inflight": 0,
+        "sweep_sec_last": 0.0,
+        "sweep_sec_max": 0.0,
+        "deferred": {name: 0 for name in PRIORITY_NAMES.values()},
+    }
+
+
+def _flush_window_stats(window: dict, metrics: dict[str, dict], scheduled: int, inflight: int) -> dict:
+    window_sec = max(1e-6, time.monotonic() - window["started_monotonic"])
+    sum_latency_ms = window["sum_latency_ms"]
+    stats = {
+        "window_sec": window_sec,
+        "probes": window["probes"],
+        "event_acked": window["event_acked"],
+        "skipped": window["skipped"],
+        "sum_latency_ms": sum_latency_ms,
+        # Average number of reads in flight over the window; 1.0 is what the
+        # old sequential sweep would have achieved at best.
+        "mean_inflight": sum_latency_ms / (window_sec * 1000.0),
+        "peak_inflight": window["peak_inflight"],
+        # From dispatching the nodes due together to their last probe finishing.
+        "sweep_sec_last": window["sweep_sec_last"],
+        "sweep_sec_max": window["sweep_sec_max"],
+        "deferred": window["deferred"],
+        "read_tokens_per_sec": KEEPALIVE_READS_PER_SEC,
+        "scheduled": scheduled,
+        "inflight": inflight,
+        "max_inflight": KEEPALIVE_MAX_INFLIGHT,
+        "max_inflight_per_router": KEEPALIVE_MAX_INFLIGHT_PER_ROUTER,
+    }
+    print(
+        f"keepalive window {window_sec:.0f}s probes={stats['probes']} event_acked={stats['event_acked']} "
+        f"skipped={stats['skipped']} deferred={sum(window['deferred'].values())} sum_latency={sum_latency_ms:.0f}ms mean_inflight={stats['mean_inflight']:.2f}",
+        file=sys.stderr,
+        flush=True,
+    )
+    _write_keepalive_metrics(metrics, stats)
+    return stats
+
+
+async def _keepalive_scheduler(
+    client: MatterClient,
+    store: dict[int, dict],
+    last_report: dict[int, float],
+    metrics: dict[str, dict],
+    histograms: dict[str, dict],
+    history: HistoryStore | None,
+    runtime: dict,
+) -> None:
+    # Min-heap of (due_epoch, node_id). due_at holds the live deadline per node;
+    # heap entries that no longer match it are stale and skipped on pop.
+    heap: list[tuple[float, int]] = []
+    due_at: dict[int, float] = {}
+    inflight: dict[int, asyncio.Task] = {}
+    # Sweep id -> [started monotonic, probes outstanding], and each in-flight
+    # node's sweep.
+    sweeps: dict[int, list] = {}
+    node_sweep: dict[int, int] = {}
+    sweep_ids = itertools.count(1)
+    slots = asyncio.Semaphore(KEEPALIVE_MAX_INFLIGHT)
+    router_slots: dict[str, asyncio.Semaphore] = {}
+    bucket = _TokenBucket(KEEPALIVE_READS_PER_SEC, KEEPALIVE_READ_BURST)
+    window = _new_window_stats()
+    next_write = time.monotonic() + KEEPALIVE_INTERVAL_SEC
+    next_compact = time.monotonic() + KEEPALIVE_HISTORY_COMPACT_SEC
+    compaction: asyncio.Task | None = None
+    closed = asyncio.create_task(client.wait_closed())
+
+    def schedule(node_id: int, due_epoch: float) -> None:
+        due_at[node_id] = due_epoch
+        heapq.heappush(heap, (due_epoch, node_id))
+
+    try:
+        while not client.closed:
+            now_epoch = time.time()
+            candidates = {node_id: (attrs, available) for node_id, attrs, available in _keepalive_candidates(store)}
+
+            for node_id in [node_id for node_id in due_at if node_id not in candidates]:
+                due_at.pop(node_id, None)
+            for node_key in [key for key in metrics if not key.isdigit() or int(key) not in candidates]:
+                metrics.pop(node_key, None)
+            for node_key in [key for key in histograms if not key.isdigit() or int(key) not in candidates]:
+                histograms.pop(node_key, None)
+            for node_key in [key for key in runtime["counters"] if int(key) not in candidates]:
+                runtime["counters"].pop(node_key, None)
+            new_ids = sorted(node_id for node_id in candidates if node_id not in due_at and node_id not in inflight)
+            for index, node_id in enumerate(new_ids):
+                # Spread first probes over one interval instead of a burst, but
+                # never earlier than a persisted backoff allows.
+                due_epoch = now_epoch + KEEPALIVE_INTERVAL_SEC * index / max(1, len(new_ids))
+                previous_entry = metrics.get(str(node_id)) or {}
+                for key in ("next_probe_epoch", "next_due_epoch"):
+                    value = previous_entry.get(key)
+                    if isinstance(value, (int, float)):
+                        due_epoch = max(due_epoch, min(float(value), now_epoch + KEEPALIVE_NODE_BACKOFF_MAX_SEC))
+                schedule(node_id, due_epoch)
+            # A node in failure backoff that reports on its own has recovered;
+            # pull it forward instead of waiting out the backoff.
+            for node_id, due_epoch in list(due_at.items()):
+                entry = metrics.get(str(node_id))
+                if (
+                    due_epoch > now_epoch
+                    and isinstance(entry, dict)
+                    and _entry_number(entry, "consecutive_failures", 0) > 0
+                    and _has_fresh_report(entry, last_report.get(node_id), now_epoch)
+                ):
+                    schedule(node_id, now_epoch)
+
+            due_now: list[tuple[int, float, int, dict]] = []
+            while heap and heap[0][0] <= now_epoch:
+                due_epoch, node_id = heapq.heappop(heap)
+                if due_at.get(node_id) != due_epoch:
+                    continue
+                del due_at[node_id]
+                previous_entry = metrics.get(str(node_id))
+                if not isinstance(previous_entry, dict):
+                    previous_entry = {}
+                priority = _probe_priority(node_id, candidates[node_id][0], previous_entry)
+                due_now.append((priority, due_epoch, node_id, previous_entry))
+
+            # Spend the airtime budget on forced, then degraded, then normal
+            # nodes; whatever does not fit is pushed back until tokens refill.
+            sweep_id = next(sweep_ids)
+            for priority, _, node_id, previous_entry in sorted(due_now, key=lambda item: item[:3]):
+                attrs, available = candidates[node_id]
+                if not _has_fresh_report(previous_entry, last_report.get(node_id), now_epoch):
+                    paths, _ = _rotate_attribute_paths(_keepalive_attribute_paths(node_id, attrs), previous_entry)
+                    reserve = KEEPALIVE_PRIORITY_RESERVE if priority == PRIORITY_NORMAL else 0.0
+                    if not bucket.try_take(len(paths), reserve):
+                        window["deferred"][PRIORITY_NAMES[priority]] += 1
+                        previous_entry["deferred_count"] = int(_entry_number(previous_entry, "deferred_count", 0)) + 1
+                        previous_entry["last_deferred_epoch"] = now_epoch
+                        metrics[str(node_id)] = previous_entry
+                        schedule(node_id, now_epoch + max(0.25, bucket.wait_sec(len(paths), reserve)))
+                        continue
+                router_key = _thread_router_key(node_id, attrs)
+                if router_key not in router_slots:
+                    router_slots[router_key] = asyncio.Semaphore(KEEPALIVE_MAX_INFLIGHT_PER_ROUTER)
+                inflight[node_id] = asyncio.create_task(
+                    _probe_keepalive_node(
+                        client,
+                        node_id,
+                        attrs,
+                        available,
+                        previous_entry,
+                        now_epoch,
+                        last_report.get(node_id),
+                        slots,
+                        router_slots[router_key],
+                        lambda: bucket.try_take(1),
+                        histograms.setdefault(str(node_id), latency_histogram.new_histogram()),
+                    )
                 )
-            elif state != "healthy" and reason and reason != previous_reason:
-                print(
-                    f"keepalive node_id={node_id} label={entry['label']!r} state {state}: {reason}",
-                    file=sys.stderr,
-                    flush=True,
+                sweeps.setdefault(sweep_id, [time.monotonic(), 0])[1] += 1
+                node_sweep[node_id] = sweep_id
+            window["peak_inflight"] = max(window["peak_inflight"], len(inflight))
+
+            history_records: list[dict] = []
+            for node_id, task in list(inflight.items()):
+                if not task.done():
+                    continue
+                del inflight[node_id]
+                sweep_id = node_sweep.pop(node_id, 0)
+                sweep = sweeps.get(sweep_id)
+                if sweep is not None:
+                    sweep[1] -= 1
+                    if sweep[1] == 0:
+                        sweep_sec = time.monotonic() - sweeps.pop(sweep_id)[0]
+                        window["sweep_sec_last"] = sweep_sec
+                        window["sweep_sec_max"] = max(window["sweep_sec_max"], sweep_sec)
+                entry = task.result()
+                history_records.extend(
+                    _history_records(node_id, entry, metrics.get(str(node_id)) or {}, time.time())
                 )
+                counters = runtime["counters"].setdefault(str(node_id), {"ok": 0, "fail": 0, "event": 0})
+                if entry.get("skipped"):
+                    window["skipped"] += 1
+                elif entry.get("ack_source") == "event":
+                    window["event_acked"] += 1
+                    counters["event"] += 1
+                else:
+                    counters["ok" if entry.get("ok") else "fail"] += 1
+                    window["probes"] += 1
+                    window["sum_latency_ms"] += _entry_number(entry, "latency_ms", 0.0)
+                if node_id not in candidates:
+                    continue
+                if entry.get("skipped"):
+                    due_epoch = _entry_number(entry, "next_probe_epoch", time.time())
+                else:
+                    due_epoch = time.time() + _next_probe_delay_sec(entry)
+                entry["next_due_epoch"] = due_epoch
+                metrics[str(node_id)] = entry
+                schedule(node_id, due_epoch)
+
+            if history is not None and history_records:
+                try:
+                    history.append(history_records)
+                except OSError as err:
+                    print(f"keepalive history append failed: {err}", file=sys.stderr, flush=True)
+            if history is not None and time.monotonic() >= next_compact and (compaction is None or compaction.done()):
+                compaction = asyncio.create_task(_compact_history(history))
+                next_compact = time.monotonic() + KEEPALIVE_HISTORY_COMPACT_SEC
+
+            if time.monotonic() >= next_write:
+                runtime["window"] = _flush_window_stats(window, metrics, len(due_at), len(inflight))
+                _write_keepalive_histograms(histograms)
+                window = _new_window_stats()
+                next_write = time.monotonic() + KEEPALIVE_INTERVAL_SEC
 
-        _write_keepalive_metrics(metrics)
+            wake_epoch = heap[0][0] if heap else time.time() + KEEPALIVE_INTERVAL_SEC
+            timeout = min(wake_epoch - time.time(), next_write - time.monotonic())
+            # Re-check the node store at least every few seconds so newly added
+            # nodes get scheduled promptly.
+            timeout = max(0.0, min(timeout, 5.0))
+            await asyncio.wait({closed, *inflight.values()}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        closed.cancel()
+        for task in inflight.values():
+            task.cancel()
+
+
+async def _compact_history(history: HistoryStore) -> None:
+    try:
+        touched = await asyncio.to_thread(history.compact)
+    except OSError as err:
+        print(f"keepalive history compaction failed: {err}", file=sys.stderr, flush=True)
+        return
+    if touched:
+        print(f"keepalive history compacted segments={touched}", file=sys.stderr, flush=True)
+
+
+async def _keepalive_session(
+    ws_url: str,
+    metrics: dict[str, dict],
+    histograms: dict[str, dict],
+    history: HistoryStore | None,
+    runtime: dict,
+) -> None:
+    # One long-lived connection: the full start_listening snapshot is paid once
+    # per connect and node_* / attribute_updated events keep it current.
+    async with MatterClient(ws_url, message_prefix="keepalive") as client:
+        store: dict[int, dict] = {}
+        last_report: dict[int, float] = {}
+        client.subscribe(lambda message: _apply_node_event(store, last_report, message))
+        discovery_started = time.monotonic()
+        store.update(await _load_node_store(client))
+        runtime["discovery_ms"] = (time.monotonic() - discovery_started) * 1000.0
+        print(
+            f"keepalive connected nodes={len(store)} discovery={runtime['discovery_ms']:.0f}ms",
+            file=sys.stderr,
+            flush=True,
+        )
+        runtime["connected"] = True
+        try:
+            await _keepalive_scheduler(client, store, last_report, metrics, histograms, history, runtime)
+        finally:
+            runtime["connected"] = False
 
 
 async def _run() -> int:
@@ -378,13 +1003,90 @@ async def _run() -> int:
     if KEEPALIVE_INTERVAL_SEC <= 0:
         return 0
 
+    metrics = KeepaliveMetricsFile(KEEPALIVE_LATENCY_FILE).load()
+    histograms = _load_keepalive_histograms()
+    history = _history_store()
+    if history is not None:
+        try:
+            os.makedirs(history.directory, exist_ok=True)
+            writable = os.access(history.directory, os.W_OK)
+        except OSError:
+            writable = False
+        if not writable:
+            print(f"keepalive history disabled: {history.directory} is not writable", file=sys.stderr, flush=True)
+            history = None
+    if history is not None:
+        await _compact_history(history)
+    # Shared with the /metrics endpoint, which only ever reads it.
+    runtime: dict = {"connected": False, "discovery_ms": None, "window": {}, "counters": {}}
+    if KEEPALIVE_METRICS_PORT > 0:
+        await serve_metrics(
+            KEEPALIVE_METRICS_HOST,
+            KEEPALIVE_METRICS_PORT,
+            lambda: render_metrics(metrics, histograms, runtime, time.time()),
+        )
+        print(
+            f"keepalive metrics on http://{KEEPALIVE_METRICS_HOST}:{KEEPALIVE_METRICS_PORT}/metrics",
+            file=sys.stderr,
+            flush=True,
+        )
+    reconnect_delay = 1.0
     while True:
+        connected_at = time.monotonic()
         try:
-            await _keepalive_once(ws_url)
+            await _keepalive_session(ws_url, metrics, histograms, history, runtime)
+            print("keepalive connection closed; reconnecting", file=sys.stderr, flush=True)
         except Exception as err:
             print(f"keepalive loop error: {err}", file=sys.stderr, flush=True)
-        await asyncio.sleep(KEEPALIVE_INTERVAL_SEC)
+        if time.monotonic() - connected_at > KEEPALIVE_INTERVAL_SEC:
+            reconnect_delay = 1.0
+        await asyncio.sleep(reconnect_delay)
+        reconnect_delay = min(float(KEEPALIVE_INTERVAL_SEC), reconnect_delay * 2.0)
+
+
+def _print_history(node_id: int, since_hours: float) -> int:
+    history = _history_store()
+    if history is None:
+        print("history disabled (MATTER_KEEPALIVE_HISTORY_DIR is empty)", file=sys.stderr)
+        return 1
+    for record in history.read(node_id, time.time() - since_hours * 3600):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(float(record["t"])))
+        kind = record.get("kind")
+        if kind == "state":
+            reason = f" ({record['reason']})" if record.get("reason") else ""
+            print(f"{stamp} state {record.get('from')} -> {record.get('to')}{reason}")
+        elif kind == "rollup":
+            reads = record["n"] - record.get("event", 0)
+            mean = f"{record['ms_sum'] / reads:.0f}ms" if reads else "-"
+            print(
+                f"{stamp} 1m n={record['n']} ok={record['ok']} event={record.get('event', 0)} "
+                f"mean={mean} max={record.get('ms_max', 0):.0f}ms state={record.get('state')}"
+            )
+        else:
+            latency = f" {record['ms']:.0f}ms" if "ms" in record else ""
+            error = f" error={record['error']}" if record.get("error") else ""
+            status = "ok" if record.get("ok") else "fail"
+            print(f"{stamp} {record.get('src')} {status}{latency} state={record.get('state')}{error}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Matter Thread keepalive prober.")
+    parser.add_argument("--history", type=int, metavar="NODE_ID", help="Print recorded history for a node and exit.")
+    parser.add_argument("--since-hours", type=float, default=24.0, help="History lookback for --history.")
+    args = parser.parse_args()
+    if args.history is not None:
+        return _print_history(args.history, args.since_hours)
+    if KEEPALIVE_READS_PER_SEC > 0 and KEEPALIVE_PRIORITY_RESERVE + KEEPALIVE_MAX_ATTRIBUTES_PER_PASS > KEEPALIVE_READ_BURST:
+        print(
+            f"warn: MATTER_KEEPALIVE_PRIORITY_RESERVE={KEEPALIVE_PRIORITY_RESERVE:g} plus "
+            f"{KEEPALIVE_MAX_ATTRIBUTES_PER_PASS} read(s) per pass exceeds MATTER_KEEPALIVE_READ_BURST="
+            f"{KEEPALIVE_READ_BURST:g}; normal-priority probes only run with a full bucket",
+            file=sys.stderr,
+            flush=True,
+        )
+    return asyncio.run(_run())
 
 
 if __name__ == "__main__":
-    raise SystemExit(asyncio.run(_run()))
+    raise SystemExit(main())
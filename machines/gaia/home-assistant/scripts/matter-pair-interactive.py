@@ -7,7 +7,7 @@ import re
 import subprocess
 import sys
 
-import websockets
+from matter_client import MatterClient
 
 WS_URL_DEFAULT = "ws://127.0.0.1:5580/ws"
 
@@ -133,45 +133,30 @@ def matching_nodes(nodes: list[dict], pairing: dict, env: dict[str, str]) -> lis
     return [node for node in nodes if pairing_matches_node(node, pairing, env)]
 
 
-async def call(ws, message_id: str, command: str, args: dict | None = None) -> dict:
-    payload = {"message_id": message_id, "command": command, "args": args or {}}
-    await ws.send(json.dumps(payload))
-
-    while True:
-        raw = await ws.recv()
-        message = json.loads(raw)
-        if message.get("event"):
-            continue
-        if message.get("message_id") == message_id:
-            return message
-
-
-async def set_thread_dataset(ws, dataset_hex: str) -> None:
-    response = await call(
-        ws,
-        "set-thread-dataset",
+async def set_thread_dataset(client, dataset_hex: str) -> None:
+    response = await client.call(
         "set_thread_dataset",
         {"dataset": dataset_hex},
+        message_id="set-thread-dataset",
     )
     if "error_code" in response:
         details = response.get("details") or "unknown error"
         raise RuntimeError(f"set_thread_dataset failed: {details}")
 
 
-async def read_nodes(ws) -> list[dict]:
-    response = await call(ws, "start-listening", "start_listening")
+async def read_nodes(client) -> list[dict]:
+    response = await client.call("start_listening", message_id="start-listening")
     if "error_code" in response:
         details = response.get("details") or "unknown error"
         raise RuntimeError(f"start_listening failed: {details}")
     return response.get("result") or []
 
 
-async def write_node_label(ws, node_id: int, label: str) -> None:
-    response = await call(
-        ws,
-        f"label:{node_id}",
+async def write_node_label(client, node_id: int, label: str) -> None:
+    response = await client.call(
         "write_attribute",
         {"node_id": node_id, "attribute_path": "0/40/5", "value": label},
+        message_id=f"label:{node_id}",
     )
     if "error_code" in response:
         details = response.get("details") or "unknown error"
@@ -182,12 +167,11 @@ async def write_node_label(ws, node_id: int, label: str) -> None:
         raise RuntimeError(f"write_attribute returned non-success status: {response}")
 
 
-async def remove_node(ws, node_id: int) -> None:
-    response = await call(
-        ws,
-        f"remove:{node_id}",
+async def remove_node(client, node_id: int) -> None:
+    response = await client.call(
         "remove_node",
         {"node_id": node_id},
+        message_id=f"remove:{node_id}",
     )
     if "error_code" in response:
         details = response.get("details") or "unknown error"
@@ -312,20 +296,19 @@ def recent_commission_logs(node_id: int | None) -> list[str]:
     return lines[-6:]
 
 
-async def commission_pairing(ws, pairing: dict, env: dict[str, str]) -> tuple[bool, str]:
+async def commission_pairing(client, pairing: dict, env: dict[str, str]) -> tuple[bool, str]:
     name = pairing.get("name") or "<unnamed>"
     code_env, code = resolved_code(pairing, env)
     if not code:
         return False, f"skip {name}: missing setup code in {code_env or 'UNSET_CODE_ENV'}"
 
-    response = await call(
-        ws,
-        f"commission:{name}",
+    response = await client.call(
         "commission_with_code",
         {
             "code": code,
             "network_only": bool(pairing.get("network_only", False)),
         },
+        message_id=f"commission:{name}",
     )
     if "error_code" in response:
         node_id = candidate_node_id_from_response(response)
@@ -339,7 +322,7 @@ async def commission_pairing(ws, pairing: dict, env: dict[str, str]) -> tuple[bo
     node_id = result.get("node_id")
     if isinstance(node_id, int) and name:
         try:
-            await write_node_label(ws, node_id, name)
+            await write_node_label(client, node_id, name)
         except Exception as err:
             return False, f"commissioned {name} (node_id={node_id}) but failed to set label: {err}"
     return True, f"commissioned {name} (node_id={node_id})"
@@ -407,9 +390,9 @@ def pick_rows(rows: list[dict], args: argparse.Namespace) -> list[dict]:
         print("no eligible entries selected")
 
 
-async def interactive_loop(ws, pairings: list[dict], env: dict[str, str], args: argparse.Namespace) -> int:
+async def interactive_loop(client, pairings: list[dict], env: dict[str, str], args: argparse.Namespace) -> int:
     while True:
-        nodes = await read_nodes(ws)
+        nodes = await read_nodes(client)
         rows = summarize(pairings, nodes, env)
 
         if args.list:
@@ -436,19 +419,24 @@ async def interactive_loop(ws, pairings: list[dict], env: dict[str, str], args:
         failures = 0
         for row in selected:
             if args.force:
-                stale_nodes = matching_nodes(nodes, row["pairing"], env)
-                for stale in stale_nodes:
-                    stale_node_id = stale.get("node_id")
-                    if not isinstance(stale_node_id, int):
-                        continue
-                    try:
-                        await remove_node(ws, stale_node_id)
-                        print(f"removed stale node_id={stale_node_id} for {row['name']}")
-                    except Exception as err:
-                        print(f"failed removing stale node_id={stale_node_id} for {row['name']}: {err}")
+                stale_node_ids = [
+                    stale.get("node_id")
+                    for stale in matching_nodes(nodes, row["pairing"], env)
+                    if isinstance(stale.get("node_id"), int)
+                ]
+                # Removals are independent, so send them all on the one connection.
+                results = await asyncio.gather(
+                    *(remove_node(client, stale_node_id) for stale_node_id in stale_node_ids),
+                    return_exceptions=True,
+                )
+                for stale_node_id, result in zip(stale_node_ids, results):
+                    if isinstance(result, Exception):
+                        print(f"failed removing stale node_id={stale_node_id} for {row['name']}: {result}")
                         failures += 1
-                nodes = await read_nodes(ws)
-            ok, message = await commission_pairing(ws, row["pairing"], env)
+                    else:
+                        print(f"removed stale node_id={stale_node_id} for {row['name']}")
+                nodes = await read_nodes(client)
+            ok, message = await commission_pairing(client, row["pairing"], env)
             print(message)
             if not ok:
                 failures += 1
@@ -496,17 +484,16 @@ async def main() -> int:
 
     env = merged_env(args.env_file)
 
-    async with websockets.connect(args.ws_url, max_size=None) as ws:
-        await ws.recv()
+    async with MatterClient(args.ws_url, message_prefix="pair") as client:
 
         dataset = env.get("MATTER_THREAD_DATASET_HEX", "").strip()
         if dataset:
             try:
-                await set_thread_dataset(ws, dataset)
+                await set_thread_dataset(client, dataset)
             except Exception as err:
                 print(f"warn: unable to set Thread dataset: {err}", file=sys.stderr)
 
-        return await interactive_loop(ws, pairings, env, args)
+        return await interactive_loop(client, pairings, env, args)
 
 
 if __name__ == "__main__":
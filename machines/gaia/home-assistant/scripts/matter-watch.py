@@ -1,27 +1,35 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
-import base64
+import functools
 import glob
+import grp
 import json
 import math
 import os
 import re
 import shutil
-import subprocess
 import sys
+import time
 import unicodedata
 import urllib.error
 import urllib.request
 from datetime import datetime
-from pathlib import Path
 
-import websockets
+from frame_profile import FrameProfiler
+from keepalive_metrics import KEEPALIVE_LATENCY_FILE_DEFAULT, KeepaliveMetricsFile
+from matter_client import MatterClient, start_listening
+from matter_node_store import AttributeIndex, NodeStore
+from matter_rooms import load_rooms_from_env, room_for_attrs
+from matter_thread import is_thread_candidate
+from solar_window import site_from_env, solar_payload
 
 WS_URL_DEFAULT = "ws://127.0.0.1:5580/ws"
-KEEPALIVE_LATENCY_FILE_DEFAULT = "/run/matter-keepalive-latency.json"
 ZBT2_BYID_GLOB_DEFAULT = "/dev/serial/by-id/usb-Nabu_Casa_ZBT-2_*"
 ZBT2_ROOM_DEFAULT = "Network Closet"
+WATCH_EVENT_COALESCE_SEC = 0.1
+WATCH_SOCKET_DEFAULT = "/run/matter-watch/watch.sock"
+WATCH_VIEWER_MAX_BUFFER = 4 * 1024 * 1024
 
 GREEN = "\033[32m"
 YELLOW = "\033[33m"
@@ -31,125 +39,27 @@ WHITE = "\033[37m"
 BLUE = "\033[34m"
 RESET = "\033[0m"
 ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
-THREAD_VENDOR_KEYWORDS = (
-    "inovelli",
-    "meross",
-    "ikea of sweden",
-    "smartwings",
-    "aqara",
-    "nanoleaf",
-)
 
+# Replaced in main() when --profile is set; a disabled profiler costs a
+# no-op context manager per phase.
+_profiler = FrameProfiler()
 
-def _b64_to_bytes(value: str) -> bytes | None:
-    try:
-        return base64.b64decode(value + "===")
-    except Exception:
-        return None
-
-
-def _mac_from_attrs(attrs: dict) -> str | None:
-    for entry in (attrs.get("0/51/0") or []):
-        hw = entry.get("4")
-        if isinstance(hw, str) and hw:
-            decoded = _b64_to_bytes(hw)
-            if decoded and len(decoded) >= 6:
-                return ":".join(f"{byte:02x}" for byte in decoded[:6])
-    return None
-
-
-def _room_key_candidates(attrs: dict) -> list[str]:
-    out: list[str] = []
-    unique_id = attrs.get("0/40/18")
-    if isinstance(unique_id, str) and unique_id:
-        out.append(f"unique_id:{unique_id}")
-    serial = attrs.get("0/40/15")
-    if isinstance(serial, str) and serial:
-        out.append(f"serial:{serial}")
-    mac = _mac_from_attrs(attrs)
-    if mac:
-        out.append(f"mac:{mac.lower()}")
-    return out
-
-
-def _room_for_attrs(attrs: dict, rooms: dict[str, str], rooms_by_label: dict[str, str]) -> str:
-    for key in _room_key_candidates(attrs):
-        if key in rooms and isinstance(rooms[key], str) and rooms[key]:
-            return rooms[key]
-
-    label = attrs.get("0/40/5")
-    if isinstance(label, str) and label and label in rooms_by_label:
-        room = rooms_by_label.get(label)
-        if isinstance(room, str) and room:
-            return room
-
-    return "Ungrouped"
-
-
-def _expand_env_backed_rooms(raw: dict) -> dict[str, str]:
-    out: dict[str, str] = {}
-    for key, room in raw.items():
-        if not isinstance(key, str) or not isinstance(room, str) or not room:
-            continue
-        if key.startswith("unique_id_env:"):
-            env_name = key.split(":", 1)[1].strip()
-            if not env_name:
-                continue
-            value = (os.getenv(env_name, "") or "").strip()
-            if not value:
-                continue
-            out[f"unique_id:{value}"] = room
-            continue
-        if key.startswith("serial_env:"):
-            env_name = key.split(":", 1)[1].strip()
-            if not env_name:
-                continue
-            value = (os.getenv(env_name, "") or "").strip()
-            if not value:
-                continue
-            out[f"serial:{value}"] = room
-            continue
-        if key.startswith("mac_env:"):
-            env_name = key.split(":", 1)[1].strip()
-            if not env_name:
-                continue
-            value = (os.getenv(env_name, "") or "").strip().lower()
-            if not value:
-                continue
-            out[f"mac:{value}"] = room
-            continue
-        out[key] = room
-    return out
 
+# Link metrics are memoised per node until a 0/53 or 0/54 attribute changes.
+_LINK_CLUSTERS = (53, 54)
+_link_metrics_cache: dict[int, tuple[tuple[int, ...], tuple[str, str]]] = {}
 
-def _parse_attr_path(path: str) -> tuple[int, int, int] | None:
-    parts = path.split("/")
-    if len(parts) != 3:
-        return None
-    try:
-        return int(parts[0]), int(parts[1]), int(parts[2])
-    except Exception:
-        return None
-
-
-def _cluster_attr_value(attrs: dict, cluster: int, attr: int):
-    candidates: list[tuple[int, object]] = []
-    for key, value in attrs.items():
-        if not isinstance(key, str):
-            continue
-        parsed = _parse_attr_path(key)
-        if not parsed:
-            continue
-        endpoint, got_cluster, got_attr = parsed
-        if got_cluster == cluster and got_attr == attr:
-            candidates.append((endpoint, value))
-
-    if not candidates:
-        return None
 
-    # Prefer non-root endpoints.
-    candidates.sort(key=lambda item: (item[0] == 0, item[0]))
-    return candidates[0][1]
+def _parse_rssi(value: int) -> int | None:
+    # Some devices report RSSI as unsigned int8; convert to signed dBm.
+    # RSSI in dBm should be <= 0 in normal reporting.
+    if -127 <= value <= 0:
+        return value
+    if 128 <= value <= 255:
+        signed = value - 256
+        if -127 <= signed <= 0:
+            return signed
+    return None
 
 
 def _walk_values(value, path: str = ""):
@@ -167,17 +77,6 @@ def _walk_values(value, path: str = ""):
 
 
 def _thread_link_metrics(attrs: dict) -> tuple[str, str]:
-    def parse_rssi(value: int) -> int | None:
-        # Some devices report RSSI as unsigned int8; convert to signed dBm.
-        # RSSI in dBm should be <= 0 in normal reporting.
-        if -127 <= value <= 0:
-            return value
-        if 128 <= value <= 255:
-            signed = value - 256
-            if -127 <= signed <= 0:
-                return signed
-        return None
-
     lqi_values: list[int] = []
     rssi_values: list[int] = []
 
@@ -189,7 +88,7 @@ def _thread_link_metrics(attrs: dict) -> tuple[str, str]:
                 continue
             raw_rssi = entry.get("6")
             if isinstance(raw_rssi, (int, float)):
-                parsed = parse_rssi(int(raw_rssi))
+                parsed = _parse_rssi(int(raw_rssi))
                 if parsed is not None:
                     rssi_values.append(parsed)
 
@@ -208,7 +107,7 @@ def _thread_link_metrics(attrs: dict) -> tuple[str, str]:
             if "lqi" in key_l and 0 <= iv <= 255:
                 lqi_values.append(iv)
             if "rssi" in key_l:
-                parsed = parse_rssi(iv)
+                parsed = _parse_rssi(iv)
                 if parsed is not None:
                     rssi_values.append(parsed)
 
@@ -219,7 +118,7 @@ def _thread_link_metrics(attrs: dict) -> tuple[str, str]:
             if "lqi" in path and 0 <= iv <= 255:
                 lqi_values.append(iv)
             if "rssi" in path:
-                parsed = parse_rssi(iv)
+                parsed = _parse_rssi(iv)
                 if parsed is not None:
                     rssi_values.append(parsed)
 
@@ -228,17 +127,14 @@ def _thread_link_metrics(attrs: dict) -> tuple[str, str]:
     return lqi, rssi
 
 
-def _is_thread_candidate(attrs: dict) -> bool:
-    vendor = str(attrs.get("0/40/1") or "").strip().lower()
-    product = str(attrs.get("0/40/3") or "").strip().lower()
-    if any(keyword in vendor for keyword in THREAD_VENDOR_KEYWORDS):
-        return True
-    for path in attrs.keys():
-        if isinstance(path, str) and (path.startswith("0/53/") or path.startswith("0/54/")):
-            return True
-    if "button" in product or "remote" in product:
-        return True
-    return False
+def _node_link_metrics(store: NodeStore, node_id: int) -> tuple[str, str]:
+    """_thread_link_metrics for a node, recomputed only after its diagnostics change."""
+    stamp = store.cluster_version(node_id, *_LINK_CLUSTERS)
+    cached = _link_metrics_cache.get(node_id)
+    if cached is None or cached[0] != stamp:
+        attrs = (store.nodes.get(node_id) or {}).get("attributes") or {}
+        cached = _link_metrics_cache[node_id] = (stamp, _thread_link_metrics(attrs))
+    return cached[1]
 
 
 def _fetch_solar(api_url: str, timeout_sec: float = 0.7) -> dict | None:
@@ -258,19 +154,41 @@ def _fetch_solar(api_url: str, timeout_sec: float = 0.7) -> dict | None:
     return data if isinstance(data, dict) else None
 
 
-def _load_keepalive_metrics(path: str) -> dict[str, dict]:
-    try:
-        raw = Path(path).read_text(encoding="utf-8")
-    except Exception:
-        return {}
-    try:
-        data = json.loads(raw)
-    except Exception:
-        return {}
-    if not isinstance(data, dict):
-        return {}
-    nodes = data.get("nodes")
-    return nodes if isinstance(nodes, dict) else {}
+class _SolarSource:
+    """Header sun data, refreshed every refresh_sec in the background.
+
+    Computed in-process from MATTER_SITE_* (in the environment or the
+    MATTER_ENV_FILE secrets file) when the site is configured here;
+    otherwise fetched from matter-solar-api in a worker thread. Frames read
+    the cached payload.
+    """
+
+    def __init__(self, api_url: str, refresh_sec: float):
+        self.api_url = api_url
+        self.refresh_sec = refresh_sec
+        self.latest: dict | None = None
+        self._site = site_from_env(os.getenv("MATTER_ENV_FILE"))
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self) -> None:
+        if self._site["latitude"] is not None and self._site["longitude"] is not None:
+            try:
+                self.latest = solar_payload(**self._site)
+                return
+            except Exception:
+                pass
+        if self.api_url:
+            self.latest = await asyncio.to_thread(_fetch_solar, self.api_url)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_sec)
+            started = time.perf_counter()
+            await self.refresh()
+            _profiler.add("solar", time.perf_counter() - started)
 
 
 def _keepalive_health(entry: dict | None) -> tuple[str, str, float | None]:
@@ -318,17 +236,14 @@ def _format_duration(sec: float) -> str:
 
 
 def _degraded_summary_lines(
-    nodes: list[dict],
+    store: NodeStore,
     keepalive_metrics: dict[str, dict],
     rooms: dict[str, str],
     rooms_by_label: dict[str, str],
 ) -> list[str]:
     now_epoch = datetime.now().timestamp()
     degraded: list[tuple[int, str]] = []
-    for node in nodes:
-        node_id = node.get("node_id")
-        if not isinstance(node_id, int):
-            continue
+    for node_id, node in store.nodes.items():
         entry = keepalive_metrics.get(str(node_id))
         state, reason, since = _keepalive_health(entry)
         if state not in {"degraded", "persistent"}:
@@ -336,9 +251,10 @@ def _degraded_summary_lines(
 
         attrs = node.get("attributes") or {}
         label = str(attrs.get("0/40/5") or f"node {node_id}")
-        room = _room_for_attrs(attrs, rooms, rooms_by_label)
-        _, rssi = _thread_link_metrics(attrs)
-        battery = _battery_text(attrs)
+        room = room_for_attrs(attrs, rooms, rooms_by_label)
+        with _profiler.phase("link"):
+            _, rssi = _node_link_metrics(store, node_id)
+        battery = _battery_text(store.index(node_id))
         age_text = ""
         if since is not None:
             age_text = _format_duration(now_epoch - since)
@@ -364,7 +280,7 @@ def _degraded_summary_lines(
     return lines
 
 
-def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bool) -> str:
+def _device_status(vendor: str, product: str, label: str, index: AttributeIndex, color: bool) -> str:
     vendor_l = (vendor or "").lower()
     product_l = (product or "").lower()
     label_l = (label or "").lower()
@@ -375,10 +291,10 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
         ("door/window sensor" in product_l)
         or (" door" in label_l)
         or label_l.endswith("door")
-        or any(isinstance(path, str) and path.endswith("/69/0") for path in attrs.keys())
+        or index.has_attribute(69, 0)
     )
     if is_door_sensor:
-        is_closed = _cluster_attr_value(attrs, 69, 0)
+        is_closed = index.value(69, 0)
         if isinstance(is_closed, bool):
             if is_closed:
                 return f"{WHITE}◼{RESET}" if color else "◼"
@@ -394,7 +310,7 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
         or ("tapo" in vendor_l and ("smart wi-fi plug" in product_l or "plug" in label_l))
     )
     if switch_like or is_mbr_bed_light:
-        onoff = _cluster_attr_value(attrs, 6, 0)
+        onoff = index.value(6, 0)
         on_symbol = f"{GREEN}●{RESET}" if color else "●"
         off_symbol = "◯"
         if isinstance(onoff, bool):
@@ -406,13 +322,11 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
     # - fully open: empty box
     # - partially closed: half-filled box
     # - closed: full box
-    covering_like = ("window covering" in product_l) or any(
-        isinstance(path, str) and "/258/" in path for path in attrs.keys()
-    )
+    covering_like = ("window covering" in product_l) or index.has_cluster(258)
     if covering_like:
-        position_raw = _cluster_attr_value(attrs, 258, 14)
+        position_raw = index.value(258, 14)
         if not isinstance(position_raw, (int, float)):
-            position_raw = _cluster_attr_value(attrs, 258, 8)
+            position_raw = index.value(258, 8)
         if isinstance(position_raw, (int, float)):
             pos = float(position_raw)
             # Matter can expose percent in 0..100 or 0..10000.
@@ -425,7 +339,7 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
 
     def _first_cluster_value(cluster: int, attr_ids: tuple[int, ...]):
         for attr_id in attr_ids:
-            value = _cluster_attr_value(attrs, cluster, attr_id)
+            value = index.value(cluster, attr_id)
             if isinstance(value, (int, float)):
                 return float(value)
         return None
@@ -438,9 +352,7 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
         f = (c * 9.0 / 5.0) + 32.0
         return str(int(round(f)))
 
-    thermostat_like = ("thermostat" in product_l) or any(
-        isinstance(path, str) and "/513/" in path for path in attrs.keys()
-    )
+    thermostat_like = ("thermostat" in product_l) or index.has_cluster(513)
     if thermostat_like:
         heat_raw = _first_cluster_value(513, (18, 16))
         temp_raw = _first_cluster_value(513, (0,))
@@ -457,9 +369,9 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
         or (("aqara" in vendor_l) and ("fp300" in product_l or "presence" in label_l))
     )
     if is_presence_sensor:
-        occ = _cluster_attr_value(attrs, 1030, 0)
+        occ = index.value(1030, 0)
         if occ is None:
-            occ = _cluster_attr_value(attrs, 1066, 0)
+            occ = index.value(1066, 0)
         present = None
         if isinstance(occ, bool):
             present = occ
@@ -471,14 +383,14 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
             icon = "👤"
 
         lux_text = ""
-        illum = _cluster_attr_value(attrs, 1024, 0)
+        illum = index.value(1024, 0)
         if isinstance(illum, (int, float)):
             raw = float(illum)
             lux = 0.0 if raw <= 0 else math.pow(10.0, (raw - 1.0) / 10000.0)
             lux_text = f"/{int(round(lux))}lx"
 
         humidity_text = ""
-        humidity = _cluster_attr_value(attrs, 1029, 0)
+        humidity = index.value(1029, 0)
         if isinstance(humidity, (int, float)):
             raw_h = float(humidity)
             # RelativeHumidityMeasurement.MeasuredValue is typically in 0.01%.
@@ -490,34 +402,44 @@ def _device_status(vendor: str, product: str, label: str, attrs: dict, color: bo
     return ""
 
 
-async def _call(ws, message_id: str, command: str, args: dict | None = None) -> dict:
-    payload = {"message_id": message_id, "command": command, "args": args or {}}
-    await ws.send(json.dumps(payload))
-    while True:
-        message = json.loads(await ws.recv())
-        if message.get("event"):
-            continue
-        if message.get("message_id") == message_id:
-            return message
-
-
-def _render(text: str, first: bool) -> None:
-    if first:
-        # First paint clears any existing scrollback noise.
-        print("\033[2J\033[H", end="")
-    else:
-        # Subsequent paints update in place to avoid flash.
-        print("\033[H", end="")
-    print(text, end="")
-    print("\033[J", end="")
-    sys.stdout.flush()
+class _Screen:
+    """Keeps the last frame and rewrites only the lines that changed."""
+
+    def __init__(self):
+        self._lines: list[str] | None = None
+        self._size: tuple[int, int] | None = None
+
+    def render(self, text: str) -> None:
+        lines = text.rstrip("\n").split("\n")
+        size = tuple(shutil.get_terminal_size((120, 40)))
+        # Line addressing needs a frame that neither wraps nor scrolls.
+        fits = len(lines) <= size[1] and all(_display_width(line) <= size[0] for line in lines)
+        if self._lines is None or size != self._size or not fits:
+            # No trailing newline: a full-height frame must not scroll.
+            out = ["\033[2J\033[H" if size != self._size else "\033[H", "\n".join(lines), "\033[J"]
+        else:
+            out = []
+            for row, line in enumerate(lines):
+                if row >= len(self._lines) or self._lines[row] != line:
+                    out.append(f"\033[{row + 1};1H{line}\033[K")
+            if len(lines) < len(self._lines):
+                out.append(f"\033[{len(lines) + 1};1H\033[J")
+        self._lines = lines if fits else None
+        self._size = size
+        if out:
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
 
 
 def _strip_ansi(text: str) -> str:
     return ANSI_RE.sub("", text)
 
 
+@functools.lru_cache(maxsize=8192)
 def _display_width(text: str) -> int:
+    # Frames repeat almost every cell, so widths are cached per string.
+    if text.isascii() and "\033" not in text:
+        return len(text)
     width = 0
     for ch in _strip_ansi(text):
         # Zero-width/control characters do not consume terminal columns.
@@ -539,41 +461,60 @@ def _pad(text: str, width: int) -> str:
     return text + (" " * (width - visible))
 
 
-def _service_last_started(service: str) -> str:
-    try:
-        result = subprocess.run(
-            [
+class _HostState:
+    """systemd unit and ZBT-2 radio state, refreshed in the background.
+
+    One `systemctl show` for all units and the by-id glob run every ttl_sec
+    off the render path; frames only read the cached values. (There is no
+    D-Bus binding in the tool's Python env, so this polls.)
+    """
+
+    def __init__(self, services: tuple[str, ...], radio_glob: str, ttl_sec: float):
+        self.services = services
+        self.radio_glob = radio_glob
+        self.ttl_sec = ttl_sec
+        self.units: dict[str, dict[str, str]] = {}
+        self.radio_present = False
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self) -> None:
+        units: dict[str, dict[str, str]] = {}
+        try:
+            proc = await asyncio.create_subprocess_exec(
                 "systemctl",
                 "show",
-                service,
-                "--property=ActiveEnterTimestamp",
-                "--value",
-            ],
-            check=False,
-            capture_output=True,
-            text=True,
-        )
-    except Exception:
-        return "unknown"
+                *self.services,
+                "--property=Id,ActiveState,ActiveEnterTimestamp",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            stdout, _ = await proc.communicate()
+            if proc.returncode == 0:
+                # One blank-line separated block per unit, in argument order.
+                for block in stdout.decode("utf-8", "replace").split("\n\n"):
+                    props = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+                    if props.get("Id"):
+                        units[props["Id"]] = props
+        except Exception:
+            pass
+        self.units = units
+        self.radio_present = bool(self.radio_glob) and bool(await asyncio.to_thread(glob.glob, self.radio_glob))
 
-    if result.returncode != 0:
-        return "unknown"
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
 
-    value = result.stdout.strip()
-    return value or "unknown"
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl_sec)
+            started = time.perf_counter()
+            await self.refresh()
+            _profiler.add("host", time.perf_counter() - started)
 
+    def last_started(self, service: str) -> str:
+        return (self.units.get(service) or {}).get("ActiveEnterTimestamp") or "unknown"
 
-def _service_is_active(service: str) -> bool:
-    try:
-        result = subprocess.run(
-            ["systemctl", "is-active", "--quiet", service],
-            check=False,
-            capture_output=True,
-            text=True,
-        )
-    except Exception:
-        return False
-    return result.returncode == 0
+    def is_active(self, service: str) -> bool:
+        return (self.units.get(service) or {}).get("ActiveState") == "active"
 
 
 def _color_lqi(value_text: str, color: bool) -> str:
@@ -608,12 +549,12 @@ def _color_rssi(value_text: str, color: bool) -> str:
     return f"{RED}{value_text}{RESET}"
 
 
-def _battery_text(attrs: dict) -> str:
+def _battery_text(index: AttributeIndex) -> str:
     # Power Source cluster (0x002F / 47):
     # - 0x000C (12): BatteryPercentRemaining (typically 0.5% units)
     # - 0x000B (11): BatteryVoltage (100 mV units)
     # - 0x000A (10): BatteryChargeLevel enum
-    percent_remaining = _cluster_attr_value(attrs, 47, 12)
+    percent_remaining = index.value(47, 12)
     if isinstance(percent_remaining, (int, float)):
         raw = float(percent_remaining)
         if raw >= 0:
@@ -621,14 +562,14 @@ def _battery_text(attrs: dict) -> str:
             if 0.0 <= pct <= 100.0:
                 return f"{int(round(pct))}%"
 
-    battery_voltage = _cluster_attr_value(attrs, 47, 11)
+    battery_voltage = index.value(47, 11)
     if isinstance(battery_voltage, (int, float)):
         raw_v = float(battery_voltage)
         if raw_v > 0:
             volts = raw_v / 10.0
             return f"{volts:.1f}V"
 
-    battery_level = _cluster_attr_value(attrs, 47, 10)
+    battery_level = index.value(47, 10)
     if isinstance(battery_level, (int, float)):
         level_map = {
             0: "unk",
@@ -641,8 +582,8 @@ def _battery_text(attrs: dict) -> str:
     return ""
 
 
-def _last_ack_info(node_id: int, attrs: dict, keepalive_metrics: dict[str, dict]) -> tuple[str, float | None]:
-    if not _is_thread_candidate(attrs):
+def _last_ack_info(node_id: int, index: AttributeIndex, keepalive_metrics: dict[str, dict]) -> tuple[str, float | None]:
+    if not is_thread_candidate(index.attrs, index):
         return "---", None
     entry = keepalive_metrics.get(str(node_id))
     if not isinstance(entry, dict):
@@ -685,16 +626,15 @@ def _env_bool(name: str, default: bool) -> bool:
     return default
 
 
-def _zbt2_row(color: bool) -> tuple[str, dict] | None:
+def _zbt2_row(color: bool, host: _HostState) -> tuple[str, dict] | None:
     if not _env_bool("MATTER_WATCH_ZBT2_ENABLE", True):
         return None
 
-    byid_glob = (os.getenv("MATTER_WATCH_ZBT2_BYID_GLOB", ZBT2_BYID_GLOB_DEFAULT) or "").strip()
     room = (os.getenv("MATTER_WATCH_ZBT2_ROOM", ZBT2_ROOM_DEFAULT) or ZBT2_ROOM_DEFAULT).strip()
     room = room or ZBT2_ROOM_DEFAULT
 
-    radio_present = bool(byid_glob) and bool(glob.glob(byid_glob))
-    otbr_active = _service_is_active("podman-otbr.service")
+    radio_present = host.radio_present
+    otbr_active = host.is_active("podman-otbr.service")
     available = radio_present and otbr_active
 
     if available:
@@ -724,28 +664,29 @@ def _zbt2_row(color: bool) -> tuple[str, dict] | None:
     return room, row
 
 
-async def _poll(ws_url: str) -> list[dict]:
-    # Matter's start_listening snapshot can exceed the websocket library's
-    # default 1 MiB frame limit once enough devices are paired.
-    async with websockets.connect(ws_url, max_size=None) as ws:
-        await ws.recv()  # server_info
-        start = await _call(ws, "start", "start_listening")
-        if "error_code" in start:
-            details = start.get("details") or "unknown error"
-            raise RuntimeError(f"start_listening failed: {details}")
-        return start.get("result") or []
+@functools.lru_cache(maxsize=64)
+def _room_box(room: str, row_lines: tuple[str, ...]) -> tuple[str, ...]:
+    # Rooms whose rows did not change since the last frame reuse their box.
+    content_width = max((_display_width(x) for x in row_lines), default=0)
+    room_title = f"─ {room} "
+    room_title_width = _display_width(room_title)
+    content_width = max(content_width, room_title_width)
+    top_fill = max(0, (content_width + 2) - room_title_width)
+    top = "┌" + room_title + ("─" * top_fill) + "┐"
+    bottom = "└" + ("─" * (content_width + 2)) + "┘"
+    return (top, *(f"│ {_pad(row, content_width)} │" for row in row_lines), bottom)
 
 
-def _table_text(
-    nodes: list[dict],
-    color: bool,
+def _header_lines(
+    store: NodeStore,
     ws_url: str,
     interval: float,
     solar_data: dict | None,
     rooms: dict[str, str],
     rooms_by_label: dict[str, str],
     keepalive_metrics: dict[str, dict],
-) -> str:
+    host: _HostState,
+) -> list[str]:
     width = shutil.get_terminal_size((120, 40)).columns
     now = datetime.now().isoformat(timespec="seconds")
 
@@ -773,29 +714,81 @@ def _table_text(
                 f"Sun@Facade: az={az:.1f}° el={el:.1f}°  horiz={h:.1f}° vert={v:.1f}° ({front_text})"
             )
 
-    lines: list[str] = [
+    return [
         f"Matter device connectivity  ({now})",
         f"WS: {ws_url}",
         solar_line,
         facade_line,
-        f"Matter last started: {_service_last_started('podman-matter-server.service')}",
-        f"OTBR last started:   {_service_last_started('podman-otbr.service')}",
-        *_degraded_summary_lines(nodes, keepalive_metrics, rooms, rooms_by_label),
-        f"Polling every {interval:.1f}s. Press Ctrl+C to stop.",
+        f"Matter last started: {host.last_started('podman-matter-server.service')}",
+        f"OTBR last started:   {host.last_started('podman-otbr.service')}",
+        *_degraded_summary_lines(store, keepalive_metrics, rooms, rooms_by_label),
+        f"Live via events, refresh every {interval:.1f}s. Press Ctrl+C to stop.",
         "-" * min(width, 160),
     ]
 
-    grouped: dict[str, list[dict]] = {}
-    for node in sorted(nodes, key=lambda n: n.get("node_id", 0)):
+
+def _node_rows(
+    store: NodeStore,
+    color: bool,
+    rooms: dict[str, str],
+    rooms_by_label: dict[str, str],
+    keepalive_metrics: dict[str, dict],
+    host: _HostState,
+) -> list[dict]:
+    """The computed per-node view: display columns plus the data behind them.
+
+    Display strings carry ANSI colors only when color is set; node rows come
+    in node-id order, followed by synthetic rows such as the ZBT-2 radio.
+    """
+    rows: list[dict] = []
+    for node_id, node in sorted(store.nodes.items()):
+        available = bool(node.get("available"))
         attrs = node.get("attributes") or {}
-        room = _room_for_attrs(attrs, rooms, rooms_by_label)
-        grouped.setdefault(room, []).append(node)
+        label = attrs.get("0/40/5") or "(no label)"
+        vendor = attrs.get("0/40/1") or ""
+        product = attrs.get("0/40/3") or ""
+        with _profiler.phase("link"):
+            _, rssi = _node_link_metrics(store, node_id)
+        index = store.index(node_id)
+        ack_raw, ack_age = _last_ack_info(node_id, index, keepalive_metrics)
+        health_entry = keepalive_metrics.get(str(node_id))
+        health_state, health_reason, _ = _keepalive_health(health_entry)
+        label_text = label[:24]
+        label_prefix, label_suffix = _label_color(available, health_entry, color)
+        last_ack_epoch = (health_entry or {}).get("last_ack_epoch")
+        rows.append(
+            {
+                "node": str(node_id),
+                "node_id": node_id,
+                "room": room_for_attrs(attrs, rooms, rooms_by_label),
+                "available": available,
+                "status": _device_status(vendor, product, label, index, color),
+                "rssi": _color_rssi(rssi, color),
+                "label": f"{label_prefix}{label_text}{label_suffix}" if label_prefix else label_text,
+                "last_ack": _color_last_ack(ack_raw, ack_age, color),
+                "last_ack_epoch": last_ack_epoch if ack_raw and isinstance(last_ack_epoch, (int, float)) else None,
+                "health": _health_badge(health_entry, color),
+                "health_state": health_state,
+                "health_reason": health_reason,
+                "battery": _battery_text(index),
+                "vendor": vendor,
+                "product": product,
+                "device": f"{vendor} {product}".strip(),
+            }
+        )
 
-    synthetic_grouped: dict[str, list[dict]] = {}
-    zbt2 = _zbt2_row(color)
+    zbt2 = _zbt2_row(color, host)
     if zbt2:
         room, row = zbt2
-        synthetic_grouped.setdefault(room, []).append(row)
+        rows.append({**row, "node_id": None, "room": room})
+    return rows
+
+
+def _table_text(header_lines: list[str], rows: list[dict]) -> str:
+    lines = list(header_lines)
+    grouped: dict[str, list[dict]] = {}
+    for row in rows:
+        grouped.setdefault(row["room"], []).append(row)
 
     preferred_order = [
         "Office",
@@ -807,7 +800,7 @@ def _table_text(
         "Ungrouped",
     ]
     room_order = sorted(
-        (set(grouped.keys()) | set(synthetic_grouped.keys())),
+        grouped.keys(),
         key=lambda r: (preferred_order.index(r) if r in preferred_order else 1000, r),
     )
 
@@ -821,42 +814,10 @@ def _table_text(
     )
 
     for room in room_order:
-        room_nodes = grouped.get(room, [])
         row_lines: list[str] = [header, header_sep]
-        for node in room_nodes:
-            node_id = node.get("node_id")
-            available = bool(node.get("available"))
-            attrs = node.get("attributes") or {}
-            label = attrs.get("0/40/5") or "(no label)"
-            vendor = attrs.get("0/40/1") or ""
-            product = attrs.get("0/40/3") or ""
-            _, rssi = _thread_link_metrics(attrs)
-            rssi_text = _color_rssi(rssi, color)
-            ack_source_id = node_id if isinstance(node_id, int) else -1
-            ack_raw, ack_age = _last_ack_info(ack_source_id, attrs, keepalive_metrics)
-            ack_text = _color_last_ack(ack_raw, ack_age, color)
-            health_entry = keepalive_metrics.get(str(node_id))
-            health_text = _health_badge(health_entry, color)
-            battery_text = _battery_text(attrs)
-            status = _device_status(vendor, product, label, attrs, color)
-            label_text = label[:24]
-            label_prefix, label_suffix = _label_color(available, health_entry, color)
-            label_colored = f"{label_prefix}{label_text}{label_suffix}" if label_prefix else label_text
-            device = f"{vendor} {product}".strip()
-            row_lines.append(
-                f"{_pad(str(node_id), 6)}  "
-                f"{_pad(status, 14)}  "
-                f"{_pad(rssi_text, 5)}  "
-                f"{_pad(label_colored, 24)}  "
-                f"{_pad(ack_text, 8)}  "
-                f"{_pad(health_text, 7)}  "
-                f"{_pad(battery_text, 7)}  "
-                f"{device}"
-            )
-
-        for row in synthetic_grouped.get(room, []):
+        for row in grouped[room]:
             row_lines.append(
-                f"{_pad(str(row['node']), 6)}  "
+                f"{_pad(row['node'], 6)}  "
                 f"{_pad(row['status'], 14)}  "
                 f"{_pad(row['rssi'], 5)}  "
                 f"{_pad(row['label'], 24)}  "
@@ -866,21 +827,241 @@ def _table_text(
                 f"{row['device']}"
             )
 
-        content_width = max((_display_width(x) for x in row_lines), default=0)
-        room_title = f"─ {room} "
-        room_title_width = _display_width(room_title)
-        content_width = max(content_width, room_title_width)
-        top_fill = max(0, (content_width + 2) - room_title_width)
-        top = "┌" + room_title + ("─" * top_fill) + "┐"
-        bottom = "└" + ("─" * (content_width + 2)) + "┘"
-        lines.append(top)
-        for row in row_lines:
-            lines.append(f"│ {_pad(row, content_width)} │")
-        lines.append(bottom)
+        lines.extend(_room_box(room, tuple(row_lines)))
 
     return "\n".join(lines) + "\n"
 
 
+class _WatchView:
+    """One published update. Header and rows are built lazily, once per color mode."""
+
+    def __init__(self, build_header=None, build_rows=None, message: str = ""):
+        self.message = message
+        self._build_header = build_header
+        self._build_rows = build_rows
+        self._header: list[str] | None = None
+        self._rows: dict[bool, list[dict]] = {}
+
+    def rows(self, color: bool) -> list[dict]:
+        if self._build_rows is None:
+            return []
+        if color not in self._rows:
+            self._rows[color] = self._build_rows(color)
+        return self._rows[color]
+
+    def text(self, color: bool) -> str:
+        if self.message:
+            return self.message
+        if self._header is None:
+            self._header = self._build_header()
+        text = _table_text(self._header, self.rows(color))
+        footer = _profiler.footer()
+        return f"{text}{footer}\n" if footer else text
+
+
+class _RowStream:
+    """--format ndjson / json-diff: all rows once, then only rows that changed."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._rows: dict[str, dict] = {}
+
+    def publish(self, view: _WatchView) -> None:
+        now_epoch = round(datetime.now().timestamp(), 3)
+        if view.message:
+            self._emit({"type": "error", "ts": now_epoch, "message": view.message.strip()})
+            return
+        rows = {row["node"]: row for row in view.rows(False)}
+        changed = [row for key, row in rows.items() if self._rows.get(key) != row]
+        removed = [key for key in self._rows if key not in rows]
+        self._rows = rows
+        if self.fmt == "json-diff":
+            if changed or removed:
+                self._emit({"ts": now_epoch, "changed": changed, "removed": removed})
+            return
+        for row in changed:
+            self._emit({"type": "row", "ts": now_epoch, **row})
+        for key in removed:
+            self._emit({"type": "removed", "ts": now_epoch, "node": key})
+
+    def _emit(self, message: dict) -> None:
+        sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+class _FrameHub:
+    """Fans rendered frames out to viewers attached over a Unix socket.
+
+    Each viewer gets the full frame on attach and afterwards only the lines
+    that changed, as NDJSON {"length": n, "lines": {row: text}} messages.
+    Frames are built once per color mode, and only for modes someone is
+    watching.
+    """
+
+    def __init__(self):
+        self._viewers: dict[asyncio.StreamWriter, bool] = {}
+        self._frames: dict[bool, list[str]] = {}
+        self._view: _WatchView | None = None
+
+    def publish(self, view: _WatchView) -> None:
+        self._view = view
+        self._frames = {color: lines for color, lines in self._frames.items() if color in self._viewers.values()}
+        for color in set(self._viewers.values()):
+            lines = view.text(color).rstrip("\n").split("\n")
+            previous = self._frames.get(color) or []
+            self._frames[color] = lines
+            changed = {
+                str(row): line for row, line in enumerate(lines) if row >= len(previous) or previous[row] != line
+            }
+            if not changed and len(lines) == len(previous):
+                continue
+            message = json.dumps({"length": len(lines), "lines": changed}, ensure_ascii=False) + "\n"
+            for writer, viewer_color in list(self._viewers.items()):
+                if viewer_color == color:
+                    self._send(writer, message)
+
+    def _send(self, writer: asyncio.StreamWriter, message: str) -> None:
+        # A viewer that stopped reading is dropped rather than buffered forever.
+        if writer.transport.get_write_buffer_size() > WATCH_VIEWER_MAX_BUFFER:
+            self._viewers.pop(writer, None)
+            writer.close()
+            return
+        writer.write(message.encode("utf-8"))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            color = bool(hello.get("color")) if isinstance(hello, dict) else False
+            lines = self._frames.get(color)
+            if lines is None:
+                text = self._view.text(color) if self._view else "Matter watch: waiting for matter-server\n"
+                lines = text.rstrip("\n").split("\n")
+                if self._view:
+                    self._frames[color] = lines
+            self._viewers[writer] = color
+            full = {"length": len(lines), "lines": {str(row): line for row, line in enumerate(lines)}}
+            self._send(writer, json.dumps(full, ensure_ascii=False) + "\n")
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._viewers.pop(writer, None)
+            writer.close()
+
+
+async def _attach(socket_path: str, use_color: bool) -> int:
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=WATCH_VIEWER_MAX_BUFFER)
+    writer.write((json.dumps({"color": use_color}) + "\n").encode("utf-8"))
+    await writer.drain()
+    screen = _Screen()
+    lines: list[str] = []
+    try:
+        while True:
+            raw = await reader.readline()
+            if not raw:
+                break
+            message = json.loads(raw)
+            length = int(message.get("length") or 0)
+            lines = (lines + [""] * length)[:length]
+            for row, line in (message.get("lines") or {}).items():
+                if int(row) < length:
+                    lines[int(row)] = line
+            screen.render("\n".join(lines) + "\n")
+    finally:
+        writer.close()
+    print(f"\nmatter-watch server at {socket_path} went away", file=sys.stderr)
+    return 1
+
+
+async def _watch_loop(args: argparse.Namespace, publish) -> None:
+    """Keep the node store current and publish() a _WatchView for every update."""
+    node_rooms, node_rooms_by_label = load_rooms_from_env()
+    keepalive_file = KeepaliveMetricsFile(args.keepalive_latency_file)
+
+    def view(store: NodeStore) -> _WatchView:
+        with _profiler.phase("keepalive"):
+            keepalive_metrics = keepalive_file.load()
+
+        def build_header() -> list[str]:
+            with _profiler.phase("header"):
+                return _header_lines(
+                    store,
+                    args.ws_url,
+                    args.interval,
+                    solar.latest,
+                    node_rooms,
+                    node_rooms_by_label,
+                    keepalive_metrics,
+                    host,
+                )
+
+        def build_rows(color: bool) -> list[dict]:
+            with _profiler.phase("rows"):
+                return _node_rows(store, color, node_rooms, node_rooms_by_label, keepalive_metrics, host)
+
+        return _WatchView(build_header, build_rows)
+
+    def apply(message: dict) -> None:
+        with _profiler.phase("events"):
+            node_id = store.apply(message)
+            if node_id is not None and message.get("event") == "node_removed":
+                _link_metrics_cache.pop(node_id, None)
+
+    host = _HostState(
+        ("podman-matter-server.service", "podman-otbr.service"),
+        (os.getenv("MATTER_WATCH_ZBT2_BYID_GLOB", ZBT2_BYID_GLOB_DEFAULT) or "").strip(),
+        float(os.getenv("MATTER_WATCH_SERVICE_TTL_SEC", "10")),
+    )
+    await host.refresh()
+    host.start()
+    solar = _SolarSource(args.solar_api_url, float(os.getenv("MATTER_WATCH_SOLAR_REFRESH_SEC", "30")))
+    await solar.refresh()
+    solar.start()
+
+    while True:
+        try:
+            # One connection for the whole session: the start_listening
+            # snapshot is fetched once and events keep the store current.
+            async with MatterClient(args.ws_url, message_prefix="watch") as client:
+                store = NodeStore()
+                # A fresh store has fresh stamps; drop entries for nodes
+                # that may be gone after the reconnect.
+                _link_metrics_cache.clear()
+                client.subscribe(apply)
+                started = time.perf_counter()
+                store.load(await start_listening(client))
+                _profiler.add("snapshot", time.perf_counter() - started)
+                decode_sec = 0.0
+                closed = asyncio.create_task(client.wait_closed())
+                try:
+                    while not client.closed:
+                        store.changed.clear()
+                        if client.decode_sec > decode_sec:
+                            _profiler.add("decode", client.decode_sec - decode_sec)
+                            decode_sec = client.decode_sec
+                        _profiler.begin_frame()
+                        frame = view(store)
+                        with _profiler.phase("render"):
+                            publish(frame)
+                        _profiler.end_frame()
+                        # Redraw on the next store change, or after --interval
+                        # for clocks, ack ages and keepalive health.
+                        changed = asyncio.create_task(store.changed.wait())
+                        await asyncio.wait({closed, changed}, timeout=args.interval, return_when=asyncio.FIRST_COMPLETED)
+                        changed.cancel()
+                        if store.changed.is_set():
+                            # Let a burst of attribute reports land in one frame.
+                            await asyncio.sleep(WATCH_EVENT_COALESCE_SEC)
+                finally:
+                    closed.cancel()
+            publish(_WatchView(message="Matter watch: connection closed; reconnecting\n"))
+        except Exception as err:
+            publish(_WatchView(message=f"Matter watch error: {err}\n"))
+
+        await asyncio.sleep(args.interval)
+
+
 async def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--ws-url", default=os.getenv("MATTER_WS_URL", WS_URL_DEFAULT))
@@ -888,49 +1069,72 @@ async def main() -> int:
     parser.add_argument("--keepalive-latency-file", default=os.getenv("MATTER_KEEPALIVE_LATENCY_FILE", KEEPALIVE_LATENCY_FILE_DEFAULT))
     parser.add_argument("--interval", type=float, default=2.0)
     parser.add_argument("--no-color", action="store_true")
+    parser.add_argument("--socket", default=os.getenv("MATTER_WATCH_SOCKET", WATCH_SOCKET_DEFAULT))
+    parser.add_argument("--serve", action="store_true", help="Own the matter-server connection and serve viewers on --socket.")
+    parser.add_argument(
+        "--socket-group",
+        default=os.getenv("MATTER_WATCH_SOCKET_GROUP", ""),
+        help="With --serve, group that may attach (socket is mode 0660); default: the server's own group.",
+    )
+    parser.add_argument("--standalone", action="store_true", help="Do not attach to a running --serve instance.")
+    parser.add_argument(
+        "--format",
+        choices=("table", "ndjson", "json-diff"),
+        default="table",
+        help="ndjson: one line per changed row; json-diff: one {changed, removed} object per update.",
+    )
+    parser.add_argument("--profile", action="store_true", help="Time each phase per frame; table frames get a p50/p99 footer.")
+    parser.add_argument("--profile-dump", default="", metavar="FILE", help="With --profile, append per-frame phase timings as NDJSON.")
+    parser.add_argument("--profile-cprofile", default="", metavar="FILE", help="With --profile, write a pstats capture of --profile-frames frames.")
+    parser.add_argument("--profile-frames", type=int, default=100)
     args = parser.parse_args()
 
-    use_color = (not args.no_color) and sys.stdout.isatty()
-    first = True
-
-    try:
-        rooms_raw = os.getenv("MATTER_NODE_ROOMS_JSON", "{}")
-        parsed_rooms = json.loads(rooms_raw)
-        node_rooms = _expand_env_backed_rooms(parsed_rooms if isinstance(parsed_rooms, dict) else {})
-    except Exception:
-        node_rooms = {}
+    global _profiler
+    if args.profile:
+        _profiler = FrameProfiler(
+            True,
+            dump_path=args.profile_dump,
+            cprofile_path=args.profile_cprofile,
+            cprofile_frames=args.profile_frames,
+        )
 
-    try:
-        rooms_by_label_raw = os.getenv("MATTER_NODE_ROOMS_BY_LABEL_JSON", "{}")
-        parsed_rooms_by_label = json.loads(rooms_by_label_raw)
-        node_rooms_by_label = parsed_rooms_by_label if isinstance(parsed_rooms_by_label, dict) else {}
-    except Exception:
-        node_rooms_by_label = {}
+    use_color = (not args.no_color) and sys.stdout.isatty()
 
-    while True:
+    if args.serve:
+        hub = _FrameHub()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        # Created 0660 rather than chmod'ed after bind, so there is no window
+        # in which any local user can connect.
+        umask = os.umask(0o117)
         try:
-            nodes = await _poll(args.ws_url)
-            solar_data = _fetch_solar(args.solar_api_url)
-            keepalive_metrics = _load_keepalive_metrics(args.keepalive_latency_file)
-            _render(
-                _table_text(
-                    nodes,
-                    use_color,
-                    args.ws_url,
-                    args.interval,
-                    solar_data,
-                    node_rooms,
-                    node_rooms_by_label,
-                    keepalive_metrics,
-                ),
-                first,
-            )
-            first = False
-        except Exception as err:
-            _render(f"Matter watch error: {err}\n", first)
-            first = False
-
-        await asyncio.sleep(args.interval)
+            server = await asyncio.start_unix_server(hub.handle, args.socket, limit=WATCH_VIEWER_MAX_BUFFER)
+        finally:
+            os.umask(umask)
+        if args.socket_group:
+            os.chown(args.socket, -1, grp.getgrnam(args.socket_group).gr_gid)
+        async with server:
+            await _watch_loop(args, hub.publish)
+        return 0
+
+    if args.format != "table":
+        # Row streams need the model, not rendered frames, so they always
+        # hold their own connection.
+        await _watch_loop(args, _RowStream(args.format).publish)
+        return 0
+
+    # Profiling measures this process's own frames, so it never attaches.
+    if not args.standalone and not args.profile and os.path.exists(args.socket):
+        try:
+            return await _attach(args.socket, use_color)
+        except OSError:
+            # Stale socket, or one this user may not open (not in the
+            # server's --socket-group): fall through and watch directly.
+            pass
+
+    screen = _Screen()
+    await _watch_loop(args, lambda view: screen.render(view.text(use_color)))
+    return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+import websockets
+
+# Events buffered per event_queue() consumer; past this they are dropped.
+EVENT_QUEUE_MAX = 10_000
+
+
+class MatterClient:
+    """Multiplexed matter-server websocket client.
+
+    A background reader owns ws.recv(): responses resolve the future
+    registered under their message_id and events fan out to subscribers, so
+    any number of commands can be in flight on one connection.
+    """
+
+    def __init__(self, ws_url: str, *, message_prefix: str = "matter"):
+        self.ws_url = ws_url
+        self.server_info: dict = {}
+        # Cumulative time spent in json.loads on received messages.
+        self.decode_sec = 0.0
+        self.events_dropped = 0
+        self._message_prefix = message_prefix
+        self._message_ids = itertools.count(1)
+        self._ws = None
+        self._reader: asyncio.Task | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._subscribers: list = []
+        self._queues: list[asyncio.Queue] = []
+
+    async def connect(self) -> "MatterClient":
+        # Matter's start_listening snapshot can exceed the websocket library's
+        # default 1 MiB frame limit once enough devices are paired.
+        self._ws = await websockets.connect(self.ws_url, max_size=None)
+        try:
+            info = json.loads(await self._ws.recv())
+        except Exception:
+            await self._ws.close()
+            raise
+        self.server_info = info if isinstance(info, dict) else {}
+        self._reader = asyncio.create_task(self._read_loop())
+        return self
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def __aenter__(self) -> "MatterClient":
+        return await self.connect()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._reader is None or self._reader.done()
+
+    async def wait_closed(self, timeout: float | None = None) -> bool:
+        """Wait for the connection to drop; returns True once it has."""
+        if self._reader is None:
+            return True
+        done, _ = await asyncio.wait({self._reader}, timeout=timeout)
+        return bool(done)
+
+    def subscribe(self, callback):
+        """Call callback(message) for every event; returns an unsubscribe function."""
+        self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def event_queue(self, maxsize: int = EVENT_QUEUE_MAX) -> asyncio.Queue:
+        """Queue of every event from now on; None is queued when the connection ends.
+
+        A consumer that falls maxsize events behind loses the newest ones,
+        counted in events_dropped.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._queues.append(queue)
+
+        def put(message: dict) -> None:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.events_dropped += 1
+
+        self.subscribe(put)
+        if self.closed and self._reader is not None:
+            _put_end(queue)
+        return queue
+
+    async def call(
+        self,
+        command: str,
+        args: dict | None = None,
+        *,
+        timeout: float | None = None,
+        message_id: str | None = None,
+    ) -> dict:
+        if self._ws is None or self.closed:
+            raise ConnectionError("matter-server connection is closed")
+        message_id = f"{message_id or self._message_prefix}:{next(self._message_ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        payload = {"message_id": message_id, "command": command, "args": args or {}}
+        try:
+            await self._ws.send(json.dumps(payload))
+            if timeout is None:
+                return await future
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def _read_loop(self) -> None:
+        error: Exception = ConnectionError("matter-server connection closed")
+        try:
+            async for raw in self._ws:
+                started = time.perf_counter()
+                try:
+                    message = json.loads(raw)
+                except ValueError as err:
+                    print(f"matter-client: skipping undecodable frame: {err}", file=sys.stderr, flush=True)
+                    continue
+                finally:
+                    self.decode_sec += time.perf_counter() - started
+                if not isinstance(message, dict):
+                    continue
+                if message.get("event"):
+                    for callback in list(self._subscribers):
+                        # One failing subscriber must not drop the shared
+                        # connection for every other consumer.
+                        try:
+                            callback(message)
+                        except Exception as err:
+                            print(
+                                f"matter-client: subscriber {getattr(callback, '__qualname__', callback)!s} "
+                                f"failed on {message.get('event')}: {err!r}",
+                                file=sys.stderr,
+                                flush=True,
+                            )
+                    continue
+                future = self._pending.pop(str(message.get("message_id")), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            error = ConnectionError(f"matter-server connection lost: {err}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            for queue in self._queues:
+                _put_end(queue)
+
+
+def _put_end(queue: asyncio.Queue) -> None:
+    # The end marker must arrive even when the consumer is far behind.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+async def start_listening(client: MatterClient) -> list[dict]:
+    response = await client.call("start_listening", message_id="start")
+    if "error_code" in response:
+        details = response.get("details") or "unknown error"
+        raise RuntimeError(f"start_listening failed: {details}")
+    return response.get("result") or []
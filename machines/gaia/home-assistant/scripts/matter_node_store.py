@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import asyncio
+import itertools
+
+# Node generations are unique across NodeStore instances, so a version
+# stamp taken from one store never matches one from a reconnect's store.
+_GENERATIONS = itertools.count(1)
+
+
+def parse_attr_path(path: str) -> tuple[int, int, int] | None:
+    parts = path.split("/")
+    if len(parts) != 3:
+        return None
+    try:
+        return int(parts[0]), int(parts[1]), int(parts[2])
+    except Exception:
+        return None
+
+
+class AttributeIndex:
+    """Parsed "endpoint/cluster/attr" paths of one node's attribute dict.
+
+    Only paths are indexed; values are read from the live dict, so attribute
+    reports need no index work unless they introduce a new path.
+    """
+
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+        self._paths: dict[tuple[int, int], list[tuple[int, str]]] = {}
+        self._clusters: dict[int, set[int]] = {}
+        for path in attrs:
+            self.add(path)
+
+    def add(self, path) -> None:
+        parsed = parse_attr_path(path) if isinstance(path, str) else None
+        if not parsed:
+            return
+        endpoint, cluster, attr = parsed
+        paths = self._paths.setdefault((cluster, attr), [])
+        if (endpoint, path) in paths:
+            return
+        paths.append((endpoint, path))
+        # Prefer non-root endpoints.
+        paths.sort(key=lambda item: (item[0] == 0, item[0]))
+        self._clusters.setdefault(cluster, set()).add(endpoint)
+
+    def value(self, cluster: int, attr: int):
+        for _, path in self._paths.get((cluster, attr), ()):
+            return self.attrs.get(path)
+        return None
+
+    def has_cluster(self, cluster: int, endpoint: int | None = None) -> bool:
+        endpoints = self._clusters.get(cluster)
+        if not endpoints:
+            return False
+        return endpoint is None or endpoint in endpoints
+
+    def has_attribute(self, cluster: int, attr: int) -> bool:
+        return bool(self._paths.get((cluster, attr)))
+
+
+def _attributes(node: dict) -> dict:
+    # matter-server may send "attributes": null for a node it has not interviewed.
+    attrs = node.get("attributes")
+    if not isinstance(attrs, dict):
+        attrs = node["attributes"] = {}
+    return attrs
+
+
+class NodeStore:
+    """In-memory node table seeded from start_listening and kept current from events.
+
+    Every change bumps version and sets changed, so a consumer can sleep on
+    the event and redo work only when the fleet actually moved.
+    """
+
+    def __init__(self):
+        self.nodes: dict[int, dict] = {}
+        self.version = 0
+        self.changed = asyncio.Event()
+        self._indexes: dict[int, AttributeIndex] = {}
+        self._generations: dict[int, int] = {}
+        self._cluster_versions: dict[tuple[int, int], int] = {}
+
+    def index(self, node_id: int) -> AttributeIndex:
+        """Attribute index for a node, built on first use and kept current by apply()."""
+        index = self._indexes.get(node_id)
+        if index is None:
+            node = self.nodes.get(node_id) or {}
+            index = AttributeIndex(_attributes(node) if node else {})
+            if node:
+                self._indexes[node_id] = index
+        return index
+
+    def cluster_version(self, node_id: int, *clusters: int) -> tuple[int, ...]:
+        """Stamp that changes when the node is replaced or an attribute of clusters changes."""
+        return (self._generations.get(node_id, 0), *(self._cluster_versions.get((node_id, c), 0) for c in clusters))
+
+    def load(self, nodes: list[dict]) -> None:
+        self.nodes = {}
+        self._indexes = {}
+        self._generations = {}
+        self._cluster_versions = {}
+        for node in nodes:
+            node_id = node.get("node_id") if isinstance(node, dict) else None
+            if isinstance(node_id, int) and node_id > 0:
+                self.nodes[node_id] = node
+                self._generations[node_id] = next(_GENERATIONS)
+        self._bump()
+
+    def apply(self, message: dict) -> int | None:
+        """Apply one matter-server event; returns the node id it changed, if any."""
+        event = message.get("event")
+        data = message.get("data")
+        if event in {"node_added", "node_updated"} and isinstance(data, dict):
+            node_id = data.get("node_id")
+            if isinstance(node_id, int) and node_id > 0:
+                self.nodes[node_id] = data
+                self._forget(node_id)
+                self._generations[node_id] = next(_GENERATIONS)
+                self._bump()
+                return node_id
+        elif event == "node_removed":
+            node_id = data.get("node_id") if isinstance(data, dict) else data
+            if isinstance(node_id, int) and self.nodes.pop(node_id, None) is not None:
+                self._forget(node_id)
+                self._generations.pop(node_id, None)
+                self._bump()
+                return node_id
+        elif event == "attribute_updated" and isinstance(data, (list, tuple)) and len(data) >= 3:
+            node_id, attribute_path, value = data[0], data[1], data[2]
+            node = self.nodes.get(node_id) if isinstance(node_id, int) else None
+            if node is not None and isinstance(attribute_path, str):
+                attrs = _attributes(node)
+                if attrs.get(attribute_path) != value or attribute_path not in attrs:
+                    if attribute_path not in attrs and node_id in self._indexes:
+                        self._indexes[node_id].add(attribute_path)
+                    attrs[attribute_path] = value
+                    parsed = parse_attr_path(attribute_path)
+                    if parsed:
+                        key = (node_id, parsed[1])
+                        self._cluster_versions[key] = self._cluster_versions.get(key, 0) + 1
+                    self._bump()
+                    return node_id
+        return None
+
+    def _forget(self, node_id: int) -> None:
+        self._indexes.pop(node_id, None)
+        for key in [key for key in self._cluster_versions if key[0] == node_id]:
+            del self._cluster_versions[key]
+
+    def _bump(self) -> None:
+        self.version += 1
+        self.changed.set()
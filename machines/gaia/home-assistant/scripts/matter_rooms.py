@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import base64
+import json
+import os
+
+
+def _b64_to_bytes(value: str) -> bytes | None:
+    try:
+        return base64.b64decode(value + "===")
+    except Exception:
+        return None
+
+
+def mac_from_attrs(attrs: dict) -> str | None:
+    for entry in (attrs.get("0/51/0") or []):
+        hw = entry.get("4")
+        if isinstance(hw, str) and hw:
+            decoded = _b64_to_bytes(hw)
+            if decoded and len(decoded) >= 6:
+                return ":".join(f"{byte:02x}" for byte in decoded[:6])
+    return None
+
+
+def room_key_candidates(attrs: dict) -> list[str]:
+    out: list[str] = []
+    unique_id = attrs.get("0/40/18")
+    if isinstance(unique_id, str) and unique_id:
+        out.append(f"unique_id:{unique_id}")
+    serial = attrs.get("0/40/15")
+    if isinstance(serial, str) and serial:
+        out.append(f"serial:{serial}")
+    mac = mac_from_attrs(attrs)
+    if mac:
+        out.append(f"mac:{mac.lower()}")
+    return out
+
+
+def room_for_attrs(attrs: dict, rooms: dict[str, str], rooms_by_label: dict[str, str]) -> str:
+    for key in room_key_candidates(attrs):
+        if key in rooms and isinstance(rooms[key], str) and rooms[key]:
+            return rooms[key]
+
+    label = attrs.get("0/40/5")
+    if isinstance(label, str) and label and label in rooms_by_label:
+        room = rooms_by_label.get(label)
+        if isinstance(room, str) and room:
+            return room
+
+    return "Ungrouped"
+
+
+def expand_env_backed_rooms(raw: dict) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for key, room in raw.items():
+        if not isinstance(key, str) or not isinstance(room, str) or not room:
+            continue
+        if key.startswith("unique_id_env:"):
+            env_name = key.split(":", 1)[1].strip()
+            if not env_name:
+                continue
+            value = (os.getenv(env_name, "") or "").strip()
+            if not value:
+                continue
+            out[f"unique_id:{value}"] = room
+            continue
+        if key.startswith("serial_env:"):
+            env_name = key.split(":", 1)[1].strip()
+            if not env_name:
+                continue
+            value = (os.getenv(env_name, "") or "").strip()
+            if not value:
+                continue
+            out[f"serial:{value}"] = room
+            continue
+        if key.startswith("mac_env:"):
+            env_name = key.split(":", 1)[1].strip()
+            if not env_name:
+                continue
+            value = (os.getenv(env_name, "") or "").strip().lower()
+            if not value:
+                continue
+            out[f"mac:{value}"] = room
+            continue
+        out[key] = room
+    return out
+
+
+def load_rooms_from_env() -> tuple[dict[str, str], dict[str, str]]:
+    """Room maps from MATTER_NODE_ROOMS_JSON and MATTER_NODE_ROOMS_BY_LABEL_JSON."""
+    try:
+        parsed_rooms = json.loads(os.getenv("MATTER_NODE_ROOMS_JSON", "{}"))
+        rooms = expand_env_backed_rooms(parsed_rooms if isinstance(parsed_rooms, dict) else {})
+    except Exception:
+        rooms = {}
+
+    try:
+        parsed_rooms_by_label = json.loads(os.getenv("MATTER_NODE_ROOMS_BY_LABEL_JSON", "{}"))
+        rooms_by_label = parsed_rooms_by_label if isinstance(parsed_rooms_by_label, dict) else {}
+    except Exception:
+        rooms_by_label = {}
+    return rooms, rooms_by_label
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import os
+
+from matter_node_store import AttributeIndex
+
+THREAD_VENDOR_KEYWORDS = (
+    "inovelli",
+    "meross",
+    "ikea of sweden",
+    "smartwings",
+    "aqara",
+    "nanoleaf",
+)
+# Battery-powered products that sleep between reports; an "offline" one is
+# usually just asleep.
+SLEEPY_PRODUCT_KEYWORDS = (
+    "button",
+    "door/window",
+    "presence",
+    "remote",
+)
+# Which nodes are expected to stay reachable is the keepalive policy, so it
+# is configured by the keepalive's environment wherever it is evaluated.
+SKIP_SLEEPY = os.getenv("MATTER_KEEPALIVE_SKIP_SLEEPY", "1").lower() not in {"0", "false", "no"}
+FORCE_NODE_IDS = {
+    int(value)
+    for value in os.getenv("MATTER_KEEPALIVE_FORCE_NODE_IDS", "").replace(",", " ").split()
+    if value.isdigit()
+}
+FORCE_LABELS = {
+    value.strip().lower()
+    for value in os.getenv("MATTER_KEEPALIVE_FORCE_LABELS", "").split(",")
+    if value.strip()
+}
+FORCE_PRODUCT_KEYWORDS = {
+    value.strip().lower()
+    for value in os.getenv("MATTER_KEEPALIVE_FORCE_PRODUCT_KEYWORDS", "").split(",")
+    if value.strip()
+}
+
+
+def is_thread_candidate(attrs: dict, index: AttributeIndex | None = None) -> bool:
+    """Whether a node looks like a Thread device: known vendor, Thread/network
+    diagnostics clusters on the root endpoint, or a button/remote product.
+
+    Pass the node's AttributeIndex when there is one to skip the path scan.
+    """
+    vendor = str(attrs.get("0/40/1") or "").strip().lower()
+    product = str(attrs.get("0/40/3") or "").strip().lower()
+    if any(keyword in vendor for keyword in THREAD_VENDOR_KEYWORDS):
+        return True
+    if index is not None:
+        if index.has_cluster(53, endpoint=0) or index.has_cluster(54, endpoint=0):
+            return True
+    else:
+        for path in attrs.keys():
+            if isinstance(path, str) and (path.startswith("0/53/") or path.startswith("0/54/")):
+                return True
+    if "button" in product or "remote" in product:
+        return True
+    return False
+
+
+def is_forced_node(node_id: int, attrs: dict) -> bool:
+    """Whether a node is always kept alive, by id, label or product keyword."""
+    if node_id in FORCE_NODE_IDS:
+        return True
+    label = str(attrs.get("0/40/5") or "").strip().lower()
+    if label and label in FORCE_LABELS:
+        return True
+    product = str(attrs.get("0/40/3") or "").strip().lower()
+    return bool(product and any(keyword in product for keyword in FORCE_PRODUCT_KEYWORDS))
+
+
+def is_always_on_thread_node(node_id: int, attrs: dict, index: AttributeIndex | None = None) -> bool:
+    """Thread node expected to stay reachable: forced nodes always, sleepy
+    products never (unless MATTER_KEEPALIVE_SKIP_SLEEPY is off), otherwise
+    is_thread_candidate().
+    """
+    if is_forced_node(node_id, attrs):
+        return True
+    product = str(attrs.get("0/40/3") or "").strip().lower()
+    if SKIP_SLEEPY and any(keyword in product for keyword in SLEEPY_PRODUCT_KEYWORDS):
+        return False
+    return is_thread_candidate(attrs, index)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import datetime
 import math
+import os
 from zoneinfo import ZoneInfo
 
 
@@ -282,3 +283,100 @@ def facade_sun_position(
         "window_y": vertical_pos,
         "in_front_of_facade": abs(horizontal_offset) <= 90.0 and sun_elevation_deg > 0.0,
     }
+
+
+SITE_ENV_KEYS = ("MATTER_SITE_LATITUDE", "MATTER_SITE_LONGITUDE", "MATTER_SITE_TIMEZONE", "MATTER_FACADE_AZIMUTH_DEG")
+
+
+def _float_or(value: str | None, default: float | None = None) -> float | None:
+    if not value:
+        return default
+    try:
+        return float(value)
+    except Exception:
+        return default
+
+
+def _site_file_values(path: str) -> dict[str, str]:
+    # Only the site keys are taken from the env file (KEY=value lines, as
+    # systemd's EnvironmentFile reads them); an unreadable file is ignored.
+    values: dict[str, str] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for raw_line in handle:
+                key, sep, value = raw_line.strip().partition("=")
+                key, value = key.strip(), value.strip()
+                if not sep or key not in SITE_ENV_KEYS:
+                    continue
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+                    value = value[1:-1]
+                values[key] = value
+    except OSError:
+        pass
+    return values
+
+
+def site_from_env(env_file: str | None = None) -> dict:
+    """solar_payload() keyword arguments from the MATTER_SITE_* environment.
+
+    Keys missing from the environment are looked up in env_file, when given.
+    """
+    values = _site_file_values(env_file) if env_file else {}
+    values.update({key: os.environ[key] for key in SITE_ENV_KEYS if os.getenv(key)})
+    return {
+        "latitude": _float_or(values.get("MATTER_SITE_LATITUDE")),
+        "longitude": _float_or(values.get("MATTER_SITE_LONGITUDE")),
+        "timezone_name": values.get("MATTER_SITE_TIMEZONE") or os.getenv("TZ") or "America/Los_Angeles",
+        "facade_azimuth_deg": _float_or(values.get("MATTER_FACADE_AZIMUTH_DEG"), 189.0),
+    }
+
+
+def solar_payload(
+    *,
+    latitude: float | None,
+    longitude: float | None,
+    timezone_name: str,
+    facade_azimuth_deg: float,
+    now: datetime.datetime | None = None,
+) -> dict:
+    now_local = now or datetime.datetime.now(ZoneInfo(timezone_name))
+    payload = {
+        "timestamp_local": now_local.isoformat(timespec="seconds"),
+        "timestamp_utc": now_local.astimezone(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "timezone": timezone_name,
+        "latitude": latitude,
+        "longitude": longitude,
+        "facade_azimuth_deg": facade_azimuth_deg,
+    }
+
+    if latitude is None or longitude is None:
+        payload["error"] = "missing MATTER_SITE_LATITUDE/LONGITUDE"
+        return payload
+
+    sunrise, sunset = solar_events_for_day(
+        now_local.date(),
+        latitude=latitude,
+        longitude=longitude,
+        timezone_name=timezone_name,
+    )
+    sun = sun_position(
+        latitude=latitude,
+        longitude=longitude,
+        timezone_name=timezone_name,
+        now=now_local,
+    )
+    facade = facade_sun_position(
+        sun_azimuth_deg=sun["azimuth_deg"],
+        sun_elevation_deg=sun["elevation_deg"],
+        facade_azimuth_deg=facade_azimuth_deg,
+    )
+    is_night = not bool(sun["is_daylight"])
+
+    payload["solar"] = {
+        "sunrise_local": sunrise.isoformat(timespec="seconds") if sunrise else None,
+        "sunset_local": sunset.isoformat(timespec="seconds") if sunset else None,
+        "day_night": "night" if is_night else "day",
+        "sun": sun,
+        "facade": facade,
+    }
+    return payload